@@ -32,7 +32,20 @@ __version__ = "0.7.0"
 
 ### IMPORTS ###
 
+import collections
+import csv
+import errno
+import hashlib
+import io
+import json
+import mmap
+import multiprocessing
+import os
 import re
+import struct
+import sys
+import threading
+import types
 import pdb
 
 try:
@@ -40,12 +53,18 @@ try:
 except:
     pass
 
-from docutils.core import publish_cmdline, default_description
+from docutils.core import publish_cmdline, publish_string, default_description
+from docutils import io as docutils_io
 from docutils.writers.latex2e import Writer as Latex2eWriter
 from docutils.writers.latex2e import LaTeXTranslator, DocumentClass
-from docutils import nodes
+from docutils import nodes, utils, writers
 from docutils.nodes import fully_normalize_name as normalize_name
 from docutils.parsers.rst import directives, Directive
+from docutils.parsers.rst.directives.misc import Include
+from docutils.parsers.rst import Parser as RstParser
+from docutils.parsers.rst import states as rst_states
+from docutils.statemachine import StringList, string2lines
+from docutils.transforms.frontmatter import DocTitle
 from docutils import frontend
 from docutils.writers.latex2e import PreambleCmds
 
@@ -79,6 +98,68 @@ HILITE_OPTIONS = {
     'c++':      'cpp',
 }
 
+# the language names of LaTeX's listings package, by Pygments name
+LISTINGS_LANGUAGES = {
+    'bash':     'bash',
+    'c':        'C',
+    'cpp':      'C++',
+    'fortran':  'Fortran',
+    'haskell':  'Haskell',
+    'html':     'HTML',
+    'java':     'Java',
+    'latex':    'TeX',
+    'lisp':     'Lisp',
+    'matlab':   'Matlab',
+    'perl':     'Perl',
+    'php':      'PHP',
+    'python':   'Python',
+    'r':        'R',
+    'ruby':     'Ruby',
+    'sql':      'SQL',
+    'tex':      'TeX',
+    'xml':      'XML',
+}
+
+CB_BACKEND_PYGMENTS = 'pygments'
+CB_BACKEND_LISTINGS = 'listings'
+CB_BACKEND_MINTED = 'minted'
+CB_BACKEND_PLAIN = 'plain'
+
+CB_BACKEND_OPTIONS = [
+    CB_BACKEND_PYGMENTS,
+    CB_BACKEND_LISTINGS,
+    CB_BACKEND_MINTED,
+    CB_BACKEND_PLAIN,
+]
+
+CB_FORMATTER_VERBATIM = 'verbatim'
+CB_FORMATTER_LIGHT = 'light'
+
+CB_FORMATTER_OPTIONS = [
+    CB_FORMATTER_VERBATIM,
+    CB_FORMATTER_LIGHT,
+]
+
+# admonitions set as alert blocks, rather than plain blocks
+ALERTBLOCK_CLASSES = ['attention', 'caution', 'danger', 'error', 'warning']
+
+# how deduplicated content is saved and referred to
+DEDUPE_CODE_BOX = 'code-box'
+DEDUPE_CODE_MACRO = 'code-macro'
+DEDUPE_IMAGE_BOX = 'image-box'
+
+# rough relative costs of typesetting frame content with LaTeX, for finding
+# the frames that are slow to compile (see `estimate_frame_cost`)
+FRAME_COST_WEIGHTS = {
+    'page':         10.0,   # each page of output, including overlays & notes
+    'fragile':      15.0,   # writing & rereading a fragile frame, per page
+    'image':        5.0,    # placing an image, per page
+    'megapixel':    20.0,   # reading an image, per million source pixels
+    'code_line':    0.5,    # a line of highlighted code, per page
+    'minted_block': 100.0,  # running Pygments from LaTeX for a codeblock
+    'table_cell':   0.3,    # a table cell, per page
+}
+
 BEAMER_SPEC =   (
     'Beamer options',
     'These are derived almost entirely from the LaTeX2e options',
@@ -147,6 +228,20 @@ BEAMER_SPEC =   (
                     'default':   SHOWNOTES_FALSE,
                 }
             ),
+            # should notes also be written to a file of their own?
+            (
+                "Write the notes of each frame to this file, as JSON if "
+                    "its name ends in '.json' and otherwise as plain text, "
+                    "so they can be read without a LaTeX build. The file is "
+                    "only rewritten if its content changes.",
+                ['--notes-file'],
+                {
+                    'action':    'store',
+                    'dest':      'notes_file',
+                    'metavar':   '<file>',
+                    'default':   None,
+                }
+            ),
             # should the pygments highlighter be used for codeblocks?
             (
                 "Use the Pygments syntax highlighter to color blocks of "
@@ -160,6 +255,23 @@ BEAMER_SPEC =   (
                     'default':   False,
                 }
             ),
+            # what highlights codeblocks?
+            (
+                "What highlights codeblocks. 'pygments' highlights them "
+                    "when converting (as --codeblocks-use-pygments), "
+                    "'listings' and 'minted' leave it to the LaTeX package "
+                    "of that name, and 'plain' typesets them as simple "
+                    "literal text. The default is 'pygments' if "
+                    "--codeblocks-use-pygments is given, else 'plain'.",
+                ['--codeblocks-backend'],
+                {
+                    'action':    'store',
+                    'type':      'choice',
+                    'dest':      'cb_backend',
+                    'choices':   CB_BACKEND_OPTIONS,
+                    'default':   None,
+                }
+            ),
             # replace tabs inside codeblocks?
             (
                 "Replace the leading tabs in codeblocks with spaces.",
@@ -179,10 +291,181 @@ BEAMER_SPEC =   (
                     'action':    'store',
                     'type':      'choice',
                     'dest':      'cb_default_lang',
-                    'choices':   HILITE_OPTIONS.values(),
+                    'choices':   list (HILITE_OPTIONS.values()),
                     'default':   'guess',
                 }
             ),
+            # how should highlighted code be marked up?
+            (
+                "How Pygments-highlighted code is marked up. 'verbatim' "
+                    "(the default) uses a fancyvrb Verbatim environment, "
+                    "which requires fragile frames. 'light' emits escaped "
+                    "\\texttt and \\textcolor markup with explicit line "
+                    "breaks and no verbatim environment, so frames whose "
+                    "only code it is aren't fragile.",
+                ['--codeblocks-formatter'],
+                {
+                    'action':    'store',
+                    'type':      'choice',
+                    'dest':      'cb_formatter',
+                    'choices':   CB_FORMATTER_OPTIONS,
+                    'default':   CB_FORMATTER_VERBATIM,
+                }
+            ),
+            # how long can highlighting a codeblock take?
+            (
+                "The most time in seconds to spend highlighting each "
+                    "codeblock with Pygments. Highlighting is done in a "
+                    "separate process, which is stopped if it takes longer, "
+                    "and the codeblock typeset as plain literal text with "
+                    "a warning. By default there is no limit and "
+                    "highlighting is done in the same process.",
+                ['--codeblocks-timeout'],
+                {
+                    'action':    'store',
+                    'type':      'float',
+                    'dest':      'cb_timeout',
+                    'metavar':   '<seconds>',
+                    'default':   None,
+                }
+            ),
+            # should codeblocks be highlighted together, by language?
+            (
+                "Highlight all the codeblocks of a language together, with "
+                    "one Pygments lexer and formatter, before translating. "
+                    "Saves the setup for each codeblock, which dominates "
+                    "for many short codeblocks. Not used with a timeout.",
+                ['--codeblocks-batch'],
+                {
+                    'action':    'store_true',
+                    'dest':      'cb_batch',
+                    'default':   False,
+                }
+            ),
+            # report the frames that are slowest to compile?
+            (
+                "Report the given number of frames estimated to take the "
+                    "longest for LaTeX to compile, from their pages "
+                    "(overlays and notes), fragility, images, highlighted "
+                    "code and table cells.",
+                ['--frame-costs'],
+                {
+                    'action':    'store',
+                    'type':      'int',
+                    'dest':      'frame_cost_report',
+                    'metavar':   '<N>',
+                    'default':   None,
+                }
+            ),
+            # should repeated code & images be emitted once only?
+            (
+                "Emit identical highlighted codeblocks and images only once. "
+                    "Content repeated across frames is saved at the start "
+                    "of the document (in a box or macro) and each frame "
+                    "refers to the saved copy.",
+                ['--dedupe'],
+                {
+                    'action':    "store_true",
+                    'dest':      'dedupe',
+                    'default':   False,
+                }
+            ),
+            # should the preamble be written separately?
+            (
+                "Write the preamble (document class, packages, theme and "
+                    "definitions) to this file and \\input it from the "
+                    "main document. The file is only rewritten if its "
+                    "content changes, so it can be precompiled into a "
+                    "LaTeX format and shared between presentations.",
+                ['--preamble-file'],
+                {
+                    'action':    'store',
+                    'dest':      'preamble_file',
+                    'metavar':   '<file>',
+                    'default':   None,
+                }
+            ),
+            # should top-level sections be written to their own files?
+            (
+                "Write each top-level section (that is, one with "
+                    "subsections) to its own file in this directory and "
+                    "\\input them from the main document. Files are only "
+                    "rewritten if their content changes.",
+                ['--split-output'],
+                {
+                    'action':    'store',
+                    'dest':      'split_output',
+                    'metavar':   '<dir>',
+                    'default':   None,
+                }
+            ),
+            # should the output be made as small as possible?
+            (
+                "Minimize the LaTeX output. Literal blocks and centered "
+                    "images use environments and macros defined once in "
+                    "the preamble rather than repeating their setup, and "
+                    "comment lines and repeated blank lines are removed.",
+                ['--minimize-output'],
+                {
+                    'action':    "store_true",
+                    'dest':      'minimize_output',
+                    'default':   False,
+                }
+            ),
+            # should the output be quick to compile, rather than faithful?
+            (
+                "Make a draft that compiles as quickly as possible. Images "
+                    "are shown as placeholder boxes, lists aren't overlaid, "
+                    "code isn't highlighted, frames are only fragile if "
+                    "marked so or holding raw LaTeX, notes are left out and "
+                    "the PDF isn't compressed.",
+                ['--draft'],
+                {
+                    'action':    "store_true",
+                    'dest':      'draft',
+                    'default':   False,
+                }
+            ),
+            # preview a single frame?
+            (
+                "Convert only the given frame (counting from 1), for a "
+                    "quick preview. Only the source of that frame, its "
+                    "enclosing section titles, the document header and "
+                    "any target definitions are parsed.",
+                ['--frame'],
+                {
+                    'action':    'store',
+                    'type':      'int',
+                    'dest':      'preview_frame',
+                    'metavar':   '<N>',
+                    'default':   None,
+                }
+            ),
+            (
+                "Convert only the frame containing the given line of the "
+                    "source, as for --frame.",
+                ['--frame-at-line'],
+                {
+                    'action':    'store',
+                    'type':      'int',
+                    'dest':      'preview_line',
+                    'metavar':   '<line>',
+                    'default':   None,
+                }
+            ),
+            # only check the structure?
+            (
+                "Check the structure of the document (e.g. for nested "
+                    "column sets or notes) and report any problems, "
+                    "without translating it. No output is written, and "
+                    "the exit status is non-zero if problems are found.",
+                ['--check'],
+                {
+                    'action':    "store_true",
+                    'dest':      'check_only',
+                    'default':   False,
+                }
+            ),
         ] + list (Latex2eWriter.settings_spec[2][2:])
     ),
 )
@@ -201,7 +484,40 @@ bool_strs = ['false','true','0','1']
 bool_vals = [False, True, False, True]
 bool_dict = dict (zip (bool_strs, bool_vals))
 
-PreambleCmds.documenttitle = r"""
+# listings typeset much like Pygments-highlighted code
+LISTINGS_SETUP = r"""\usepackage{listings}
+\lstset{basicstyle=\ttfamily,columns=fullflexible,keepspaces=true,
+  showstringspaces=false,
+  keywordstyle=\color[rgb]{0,0.5,0}\bfseries,
+  commentstyle=\color[rgb]{0.25,0.5,0.5}\itshape,
+  stringstyle=\color[rgb]{0.73,0.13,0.13}}
+"""
+
+# for drafts, images are placeholders and the PDF is left uncompressed, so
+# that it's quicker to write
+DRAFT_SETUP = r"""\setkeys{Gin}{draft}
+\ifdefined\pdfcompresslevel
+  \pdfcompresslevel=0
+  \pdfobjcompresslevel=0
+\fi
+"""
+
+# definitions replacing the setup of each literal block and centered image,
+# when minimizing output
+RTBQUOTE_DEF = r"""\newenvironment{rtbquote}%
+  {\setbeamerfont{quote}{parent={}}\begin{quote}}%
+  {\end{quote}\setbeamerfont{quote}{parent=quotation}}"""
+RTBCENTER_DEF = r"""\newcommand{\rtbcenter}[1]{\noindent\makebox[\textwidth][c]{#1}}"""
+
+# environments whose content is taken literally, so left alone when
+# minimizing output
+VERBATIM_BEGIN_RE = re.compile (r'\\begin\{(Verbatim|BVerbatim|verbatim|'
+    r'verbatimtab|listing|lstlisting|minted|alltt|comment)\}')
+
+# a line of repeated punctuation, as adorns a section title
+SECTION_ADORNMENT_RE = re.compile (r'^([!-/:-@[-`{-~])\1*$')
+
+docinfo_title = r"""
 %% Document title
 \title[%s]{%s}
 \author[%s]{%s}
@@ -294,11 +610,595 @@ def index (seq, f, fail=None):
     While this could be written in a neater fashion in Python 2.6, this method
     maintains compatiability with earlier version.
     """
-    for index in (i for i in xrange (len (seq)) if f (seq[i])):
+    for index in (i for i in range (len (seq)) if f (seq[i])):
         return index
     return fail
 
 
+def alpha_label (num):
+    """
+    Return a label for a number using only lowercase letters.
+
+    :Parameters:
+        num
+            A non-negative integer.
+
+    :Returns:
+        A string of letters, unique to that number.
+
+    LaTeX macro names can't contain digits, so this is used to name
+    generated macros and boxes. For example::
+
+        >>> alpha_label (0)
+        'a'
+        >>> alpha_label (27)
+        'bb'
+
+    """
+    label = ''
+    while True:
+        num, rem = divmod (num, 26)
+        label = chr (ord ('a') + rem) + label
+        if (num == 0):
+            return label
+
+
+def write_if_changed (fpath, text, encoding, errors='strict'):
+    """
+    Write text to a file, unless the file already holds exactly that text.
+
+    :Parameters:
+        fpath
+            The path of the file to write.
+        text
+            The (unicode) text to write.
+        encoding
+            The encoding to write the text in.
+        errors
+            How to handle encoding errors.
+
+    :Returns:
+        A boolean indicating whether the file was written.
+
+    Leaving unchanged files untouched preserves their modification times, so
+    that build tools looking at them don't redo work needlessly.
+    """
+    ## Preconditions & preparation:
+    data = text.encode (encoding, errors)
+    ## Main:
+    try:
+        infile = open (fpath, 'rb')
+        try:
+            if (infile.read() == data):
+                return False
+        finally:
+            infile.close()
+    except IOError:
+        pass
+    outfile = open (fpath, 'wb')
+    try:
+        outfile.write (data)
+    finally:
+        outfile.close()
+    return True
+
+
+def output_relative_path (settings, fpath):
+    """
+    Return the path by which the output refers to another file written.
+
+    :Parameters:
+        settings
+            The settings of the conversion.
+        fpath
+            The path of the file, relative to the working directory.
+
+    :Returns:
+        The path relative to the directory of the output (where LaTeX will
+        be run), with forward slashes. If the output has no path (e.g. it is
+        written to stdout), this is `fpath` as given.
+
+    """
+    destination = getattr (settings, '_destination', None)
+    if (not destination) or (destination == '-'):
+        return fpath.replace ('\\', '/')
+    return utils.relative_path (destination, fpath)
+
+
+def file_digest (data, chunk_size=1 << 20):
+    """
+    Return a hash of some (possibly memory-mapped) file contents.
+
+    :Parameters:
+        data
+            The file contents, as a string or mmap.
+        chunk_size
+            How much of the data to hash at a time.
+
+    :Returns:
+        A hexadecimal digest string.
+
+    Hashing chunk by chunk avoids copying all of a mapped file into memory.
+    """
+    digest = hashlib.sha1()
+    for posn in range (0, len (data), chunk_size):
+        digest.update (data[posn:posn + chunk_size])
+    return digest.hexdigest()
+
+
+class LruCache (object):
+    """
+    A mapping of limited size, dropping the least recently used entries.
+
+    :Parameters:
+        max_size
+            The most entries to hold.
+
+    It may be shared by conversions running in different threads.
+    """
+
+    def __init__ (self, max_size):
+        self.max_size = max_size
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def get (self, key, default=None):
+        with self.lock:
+            try:
+                value = self.entries.pop (key)
+            except KeyError:
+                return default
+            # re-inserted as the most recently used
+            self.entries[key] = value
+            return value
+
+    def put (self, key, value):
+        with self.lock:
+            self.entries.pop (key, None)
+            self.entries[key] = value
+            while (self.max_size < len (self.entries)):
+                self.entries.popitem (last=False)
+
+
+def parse_line_ranges (spec):
+    """
+    Parse a specification of line numbers, like that used by Sphinx.
+
+    :Parameters:
+        spec
+            A comma-separated list of line numbers and ranges of them.
+
+    :Returns:
+        A list of inclusive (first, last) line numbers, counting from 1. The
+        last line of an open-ended range is None.
+
+    For example::
+
+        >>> parse_line_ranges ('1-3, 5, 10-')
+        [(1, 3), (5, 5), (10, None)]
+
+    """
+    ranges = []
+    for item in spec.split (','):
+        item = item.strip()
+        try:
+            if ('-' in item):
+                first, last = item.split ('-', 1)
+                first = int (first or 1)
+                last = last.strip() and int (last) or None
+            else:
+                first = last = int (item)
+        except ValueError:
+            raise ValueError ('invalid line specification "%s"' % spec)
+        if (first < 1) or ((last is not None) and (last < first)):
+            raise ValueError ('invalid line range "%s"' % item)
+        ranges.append ((first, last))
+    return ranges
+
+
+def select_lines (data, ranges, start=0, end=None):
+    """
+    Return the byte ranges of the given lines in a stretch of text.
+
+    :Parameters:
+        data
+            The text, as a string or mmap.
+        ranges
+            A list of (first, last) line numbers as from `parse_line_ranges`.
+        start, end
+            The stretch of the data to count lines in.
+
+    :Returns:
+        A list of (start, end) offsets of the selected lines.
+
+    The text is only scanned as far as the last line needed.
+    """
+    ## Preconditions & preparation:
+    if (end is None):
+        end = len (data)
+    lasts = [last for first, last in ranges]
+    if (None in lasts):
+        needed = None
+    else:
+        needed = max (lasts)
+    ## Main:
+    # offsets of the starts of lines, and the end of the last one
+    line_starts = [start]
+    posn = start
+    while (posn < end) and ((needed is None) or (len (line_starts) <= needed)):
+        posn = data.find (b'\n', posn, end)
+        posn = (posn == -1) and end or (posn + 1)
+        line_starts.append (posn)
+    line_cnt = len (line_starts) - 1
+    selected = []
+    for first, last in ranges:
+        if (line_cnt < first):
+            continue
+        if (last is None) or (line_cnt < last):
+            last = line_cnt
+        selected.append ((line_starts[first - 1], line_starts[last]))
+    return selected
+
+
+def find_pyobject (data, name, start=0, end=None):
+    """
+    Return the byte range of a Python class or function definition.
+
+    :Parameters:
+        data
+            The source code, as a string or mmap.
+        name
+            The (byte string) name of the object, which can be dotted (e.g.
+            'MyClass.method') to look in a class.
+        start, end
+            The stretch of the data to look in.
+
+    :Returns:
+        A (start, end) tuple of offsets.
+
+    This works on the layout of the code rather than parsing it, so an
+    object runs from its 'def' or 'class' line up to the next line that is
+    indented no further.
+    """
+    ## Preconditions & preparation:
+    if (end is None):
+        end = len (data)
+    ## Main:
+    for part in name.split (b'.'):
+        obj_re = re.compile (br'^([ \t]*)(?:def|class)[ \t]+' +
+            re.escape (part) + br'\b', re.MULTILINE)
+        match = obj_re.search (data, start, end)
+        if (match is None):
+            raise ValueError ('object "%s" not found' % name.decode ('ascii',
+                'replace'))
+        indent = len (match.group (1).expandtabs())
+        start = match.start()
+        # find the first (non-blank) line indented no further
+        posn = data.find (b'\n', match.end(), end)
+        obj_end = end
+        while (posn != -1) and (posn + 1 < end):
+            line_start = posn + 1
+            posn = data.find (b'\n', line_start, end)
+            line = data[line_start:(posn == -1) and end or posn]
+            if line.strip() and (len (line.expandtabs()) -
+                    len (line.expandtabs().lstrip()) <= indent):
+                obj_end = line_start
+                break
+        end = obj_end
+    ## Postconditions & return:
+    return start, end
+
+
+def image_pixel_size (infile):
+    """
+    Return the size in pixels of a PNG, GIF or JPEG image.
+
+    :Parameters:
+        infile
+            The image file, open for reading in binary mode.
+
+    :Returns:
+        A (width, height) pair, or None for other formats.
+
+    Only as much of the file is read as is needed to find the size.
+    """
+    ## Preconditions & preparation:
+    header = infile.read (24)
+    ## Main:
+    if (header[:8] == b'\x89PNG\r\n\x1a\n') and (header[12:16] == b'IHDR'):
+        return struct.unpack ('>II', header[16:24])
+    if (header[:4] == b'GIF8'):
+        return struct.unpack ('<HH', header[6:10])
+    if (header[:2] == b'\xff\xd8'):
+        # step through the segments to the frame header
+        infile.seek (2)
+        while True:
+            marker = infile.read (2)
+            if (len (marker) < 2) or (marker[:1] != b'\xff'):
+                return None
+            length = infile.read (2)
+            if (len (length) < 2):
+                return None
+            code = bytearray (marker)[1]
+            if (0xc0 <= code <= 0xcf) and (code not in (0xc4, 0xc8, 0xcc)):
+                height, width = struct.unpack ('>xHH', infile.read (5))
+                return width, height
+            infile.seek (struct.unpack ('>H', length)[0] - 2, 1)
+    ## Postconditions & return:
+    return None
+
+
+def estimate_frame_cost (stats, megapixels=0.0, weights=FRAME_COST_WEIGHTS):
+    """
+    Estimate how long LaTeX will take to compile a frame.
+
+    :Parameters:
+        stats
+            The content of the frame, as recorded by the translator: the
+            number of pages (i.e. overlays) and of notes pages, whether it's
+            fragile, its images and the number of highlighted code lines,
+            codeblocks left to minted and table cells.
+        megapixels
+            The total size of the frame's images, in millions of pixels.
+        weights
+            The relative cost of each kind of content.
+
+    :Returns:
+        The estimated cost, in arbitrary units.
+
+    """
+    pages = stats['pages']
+    cost = weights['page'] * (pages + stats['note_pages'])
+    if stats['fragile']:
+        cost += weights['fragile'] * pages
+    cost += pages * (weights['image'] * len (stats['images']) +
+        weights['code_line'] * stats['code_lines'] +
+        weights['table_cell'] * stats['table_cells'])
+    cost += (weights['megapixel'] * megapixels +
+        weights['minted_block'] * stats['minted_blocks'])
+    return cost
+
+
+def open_csv_reader (fpath, encoding, delim=',', data=None):
+    """
+    Open a CSV file for reading row by row.
+
+    :Parameters:
+        fpath
+            The path to the CSV file.
+        encoding
+            The encoding of the file.
+        delim
+            The character separating cells.
+        data
+            The contents of the file, as bytes, if already in memory (in
+            which case the file itself isn't opened).
+
+    :Returns:
+        The open file (for closing by the caller) and an iterator over its
+        rows, each a list of unicode cells.
+
+    """
+    # the Python 2 csv module only reads byte strings
+    if (sys.version_info[0] < 3):
+        if (data is None):
+            infile = open (fpath, 'rb')
+        else:
+            infile = io.BytesIO (data)
+        reader = csv.reader (infile, delimiter=delim.encode (encoding))
+        rows = ([cell.decode (encoding) for cell in row] for row in reader)
+    else:
+        if (data is None):
+            infile = io.open (fpath, encoding=encoding, newline='')
+        else:
+            infile = io.TextIOWrapper (io.BytesIO (data), encoding=encoding,
+                newline='')
+        rows = csv.reader (infile, delimiter=delim)
+    return infile, rows
+
+
+def find_source_file (settings, source, path):
+    """
+    Return the path of a file referred to by a document.
+
+    :Parameters:
+        settings
+            The settings of the conversion.
+        source
+            The path of the document (or included file) referring to the file.
+        path
+            The path as given in the document, relative to `source`.
+
+    :Returns:
+        The normalised path, as a key of the source bundle if the conversion
+        has one (see `convert_bundle`), or else relative to the working
+        directory.
+
+    """
+    if (getattr (settings, '_source_bundle', None) is not None):
+        return os.path.normpath (os.path.join (os.path.dirname (source or ''),
+            path))
+    source_dir = os.path.dirname (os.path.abspath (source or ''))
+    return utils.relative_path (None,
+        os.path.normpath (os.path.join (source_dir, path)))
+
+
+def read_bundle_file (settings, fpath):
+    """
+    Return the contents of a file in the source bundle of a conversion.
+
+    :Parameters:
+        settings
+            The settings of the conversion.
+        fpath
+            The path of the file, as returned by `find_source_file`.
+
+    :Returns:
+        The contents of the file as bytes, or None if the conversion has no
+        bundle (and so files are read from disk).
+
+    Raises an IOError if there is a bundle but the file isn't in it.
+    """
+    bundle = getattr (settings, '_source_bundle', None)
+    if (bundle is None):
+        return None
+    try:
+        return bundle[fpath]
+    except KeyError:
+        raise IOError (errno.ENOENT, 'No such file in the source bundle',
+            fpath)
+
+
+def select_columns (row, ranges):
+    """
+    Return the selected cells of a table row.
+
+    :Parameters:
+        row
+            A list of cells.
+        ranges
+            A list of (first, last) column numbers as from
+            `parse_line_ranges`.
+
+    :Returns:
+        A list of the selected cells, with missing ones as empty strings.
+
+    For example::
+
+        >>> select_columns (['a', 'b', 'c', 'd'], [(3, None), (1, 1)])
+        ['c', 'd', 'a']
+
+    """
+    cells = []
+    for first, last in ranges:
+        if (last is None):
+            last = max (len (row), first)
+        for i in range (first - 1, last):
+            if (i < len (row)):
+                cells.append (row[i])
+            else:
+                cells.append ('')
+    return cells
+
+
+def table_col_widths (rows):
+    """
+    Return relative column widths for a table of plain text cells.
+
+    :Parameters:
+        rows
+            A list of rows, each a list of strings.
+
+    :Returns:
+        A list of widths, in proportion to the longest cell in each column
+        and adding up to (about) 100, as docutils table directives do.
+
+    """
+    col_cnt = max ([len (row) for row in rows] + [1])
+    longest = [1] * col_cnt
+    for row in rows:
+        for i, cell in enumerate (row):
+            longest[i] = max (longest[i], len (cell))
+    total = float (sum (longest))
+    return [max (1, int (round (100 * x / total))) for x in longest]
+
+
+def build_table (header_rows, body_rows, col_widths=None):
+    """
+    Build a docutils table from rows of plain text cells.
+
+    :Parameters:
+        header_rows
+            A list of rows for the table head, each a list of strings.
+        body_rows
+            A list of rows for the table body.
+        col_widths
+            The relative widths of the columns. By default, these are
+            calculated from the cells.
+
+    :Returns:
+        A table node.
+
+    """
+    ## Preconditions & preparation:
+    if (col_widths is None):
+        col_widths = table_col_widths (header_rows + body_rows)
+    col_cnt = len (col_widths)
+    ## Main:
+    table = nodes.table()
+    tgroup = nodes.tgroup (cols=col_cnt)
+    table += tgroup
+    for width in col_widths:
+        tgroup += nodes.colspec (colwidth=width)
+    for section, rows in ((nodes.thead, header_rows),
+            (nodes.tbody, body_rows)):
+        if not rows:
+            continue
+        section_node = section()
+        for row in rows:
+            row_node = nodes.row()
+            for i in range (col_cnt):
+                entry = nodes.entry()
+                if (i < len (row)) and row[i]:
+                    entry += nodes.paragraph (row[i], row[i])
+                row_node += entry
+            section_node += row_node
+        tgroup += section_node
+    ## Postconditions & return:
+    return table
+
+
+def is_simple_table (node):
+    """
+    Can a table be set as a plain LaTeX tabular?
+
+    :Parameters:
+        node
+            A docutils table node.
+
+    :Returns:
+        True if the table has a single group of columns, all with a width, no
+        cells spanning rows or columns and no nested tables.
+
+    """
+    tgroups = [x for x in node.children if isinstance (x, nodes.tgroup)]
+    if (len (tgroups) != 1):
+        return False
+    for colspec in tgroups[0].traverse (nodes.colspec):
+        if ('colwidth' not in colspec):
+            return False
+    for entry in tgroups[0].traverse (nodes.entry):
+        if ('morerows' in entry) or ('morecols' in entry):
+            return False
+    for table in tgroups[0].traverse (nodes.table):
+        return False
+    return True
+
+
+def tabular_col_specs (col_widths, bar='|'):
+    """
+    Return the column specification for a tabular.
+
+    :Parameters:
+        col_widths
+            The widths of the columns in the source, in characters.
+        bar
+            The vertical rule between columns, if any.
+
+    :Returns:
+        A specification of paragraph columns, sized as the docutils LaTeX
+        writer does (taking the source as 80 characters wide, and keeping the
+        table within the line).
+
+    """
+    total_width = sum ([(x + 1) / 80.0 for x in col_widths])
+    factor = 0.93
+    if (1.0 < total_width):
+        factor /= total_width
+    return ''.join (['%sp{%.3f\\linewidth}' % (bar,
+        factor * (x + 1) / 80.0 + 0.005) for x in col_widths]) + bar
+
+
 def node_has_class (node, classes):
     """
     Does the node have one of these classes?
@@ -345,92 +1245,506 @@ def node_lang_class (node):
     seen.
     """
     ## Main:
-    for cname in node['classes']:
-        if (cname.startswith ('lang-')):
-            return cname[5:]
-    return None
+    for cname in node['classes']:
+        if (cname.startswith ('lang-')):
+            return cname[5:]
+    return None
+
+
+def first_line_node (node):
+    """
+    Return the node, or else its first descendant, that records its source
+    line.
+
+    Not all nodes record their line (e.g. sections and admonitions), but
+    their content should.
+    """
+    for line_node in node.traverse():
+        if line_node.line:
+            return line_node
+    return node
+
+
+def admonition_classes (node):
+    """
+    Return the classes of an admonition, other than the generic 'admonition'.
+
+    The class gives the kind of admonition (e.g. 'warning'), so there should
+    be exactly one.
+    """
+    return [cls for cls in node['classes'] if cls != 'admonition']
+
+
+def wrap_children_in_columns (par_node, children, width=None):
+    """
+    Replace this node's children with columns containing the passed children.
+
+    :Parameters:
+        par_node
+            The node whose children are to be replaced.
+        children
+            The new child nodes, to be wrapped in columns and added to the
+            parent.
+        width
+            The width to be assigned to the columns.
+
+    In constructing columns for beamer using either 'simplecolumns' approach,
+    we have to wrap the original elements in column nodes, giving them an
+    appropriate width. Note that this mutates parent node.
+    """
+    ## Preconditions & preparation:
+    # TODO: check for children and raise error if not?
+    width = width or 0.90
+    ## Main:
+    # calc width of child columns
+    child_cnt = len (children)
+    col_width = width / child_cnt
+    # set each element of content in a column and add to column set
+    new_children = []
+    for child in children:
+        col = column()
+        col.width = col_width
+        col.append (child)
+        new_children.append (col)
+    par_node.children = new_children
+
+
+def has_sub_sections (node):
+    """Test whether or not a section node has children with the
+    tagname section.  The function is going to be used to assess
+    whether or not a certain section is the lowest level.  Sections
+    that have not sub-sections (i.e. no children with the tagname
+    section) are assumed to be Beamer slides"""
+    for child in node.children:
+        if child.tagname == 'section':
+            return True
+    return False
+
+
+def string_to_bool (stringin, default=True):
+    """
+    Turn a commandline arguement string into a boolean value.
+    """
+    if type (stringin) == bool:
+        return stringin
+    temp = stringin.lower()
+    if temp not in bool_strs:
+        return default
+    else:
+        return bool_dict[temp]
+
+
+def highlight_code (text, lang, formatter=CB_FORMATTER_VERBATIM,
+        ttypes=None):
+    """
+    Syntax-highlight source code using Pygments.
+
+    :Parameters:
+        text
+            The code to be formatted.
+        lang
+            The language of the source code.
+        formatter
+            How the highlighted code is marked up, one of
+            `CB_FORMATTER_OPTIONS`.
+        ttypes
+            An optional set, which is updated with the Pygments token types
+            found in the code.
+
+    :Returns:
+        A LaTeX formatted representation of the source code.
+
+    """
+    ## Preconditions & preparation:
+    from pygments import format as format_tokens
+    from pygments.formatters import LatexFormatter
+    ## Main:
+    lexer = get_lexer (text, lang)
+    lexer.add_filter('whitespace', tabsize=3, tabs=' ')
+    tokens = list (lexer.get_tokens (text))
+    if (ttypes is not None):
+        ttypes.update ([ttype for ttype, value in tokens])
+    if (formatter == CB_FORMATTER_LIGHT):
+        return format_tokens_light (tokens)
+    return format_tokens (tokens, LatexFormatter(tabsize=3))
+
+
+def highlight_code_batch (texts, lang, formatter=CB_FORMATTER_VERBATIM,
+        ttypes=None):
+    """
+    Syntax-highlight several pieces of code in the same language.
+
+    :Parameters:
+        texts
+            A list of the pieces of code.
+        lang
+            The language of the code, which can't be 'guess'.
+        formatter
+            How the highlighted code is marked up, one of
+            `CB_FORMATTER_OPTIONS`.
+        ttypes
+            An optional set, which is updated with the Pygments token types
+            found in the code.
+
+    :Returns:
+        A list of the LaTeX for each piece of code, as `highlight_code`
+        would give.
+
+    One lexer and formatter are made for all the code. Each piece is lexed
+    on its own, so an unclosed string or comment can't run into the next.
+    Verbatim output is formatted in a single pass, with a line holding only
+    a separator (which can't appear in the code) between pieces, and then
+    split back into an environment for each piece.
+    """
+    ## Preconditions & preparation:
+    from pygments import format as format_tokens
+    from pygments.formatters import LatexFormatter
+    from pygments.token import Text
+    assert (lang != 'guess'), "can't guess the language of a batch"
+    # Pygments escapes with control characters, so one from the private
+    # use area is taken
+    sep = u'\ue000'
+    ## Main:
+    lexer = get_lexer (u'', lang)
+    lexer.add_filter('whitespace', tabsize=3, tabs=' ')
+    token_lists = [list (lexer.get_tokens (x)) for x in texts]
+    if (ttypes is not None):
+        for tokens in token_lists:
+            ttypes.update ([ttype for ttype, value in tokens])
+    if (formatter == CB_FORMATTER_LIGHT):
+        return [format_tokens_light (x) for x in token_lists]
+    latex_fmt = LatexFormatter(tabsize=3)
+    if [x for x in texts if (sep in x)]:
+        return [format_tokens (x, latex_fmt) for x in token_lists]
+    all_tokens = []
+    for tokens in token_lists:
+        if all_tokens:
+            all_tokens.append ((Text, sep + u'\n'))
+        all_tokens.extend (tokens)
+    latex = format_tokens (all_tokens, latex_fmt)
+    ## Postconditions & return:
+    begin, rest = latex.split ('\n', 1)
+    body, end = rest.rsplit ('\\end{Verbatim}', 1)
+    bodies = body.split (sep + u'\n')
+    assert (len (bodies) == len (texts)), "batch split at the wrong places"
+    return ['%s\n%s\\end{Verbatim}%s' % (begin, x, end) for x in bodies]
+
+
+def highlight_code_in_worker (text, lang, formatter):
+    """
+    Syntax-highlight source code, as `highlight_code` but in a worker process.
+
+    :Returns:
+        The LaTeX formatted code and a list of the names of the token types
+        found in it, as token types don't survive pickling.
+
+    """
+    ttypes = set()
+    hilite_code = highlight_code (text, lang, formatter, ttypes)
+    return hilite_code, [str (ttype) for ttype in ttypes]
+
+
+class HighlightWorker (object):
+    """
+    Highlights code in a separate process, which is abandoned if it takes too
+    long.
+
+    Some lexers take an age on pathological input, and can't be interrupted
+    by a thread, so the process is killed and another started for the next
+    code.
+    """
+
+    def __init__ (self, timeout):
+        self.timeout = timeout
+        self.pool = None
+
+    def highlight (self, text, lang, formatter, ttypes=None):
+        """
+        Syntax-highlight source code, taking the same arguments as
+        `highlight_code`.
+
+        :Returns:
+            The LaTeX formatted code, or None if highlighting took longer than
+            the timeout.
+
+        """
+        ## Preconditions & preparation:
+        from pygments.token import string_to_tokentype
+        if (self.pool is None):
+            self.pool = multiprocessing.Pool (1)
+        ## Main:
+        result = self.pool.apply_async (highlight_code_in_worker,
+            (text, lang, formatter))
+        try:
+            hilite_code, ttype_names = result.get (self.timeout)
+        except multiprocessing.TimeoutError:
+            self.close()
+            return None
+        if (ttypes is not None):
+            ttypes.update ([string_to_tokentype (x) for x in ttype_names])
+        ## Postconditions & return:
+        return hilite_code
+
+    def close (self):
+        """
+        Stop the worker process, if any.
+        """
+        if (self.pool is not None):
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+
+def backend_language (lang, backend):
+    """
+    Return the name a LaTeX highlighting package knows a language by.
+
+    :Parameters:
+        lang
+            The language of the code, as given to a code block (i.e. a name
+            of `HILITE_OPTIONS` or Pygments).
+        backend
+            The package, `CB_BACKEND_LISTINGS` or `CB_BACKEND_MINTED`.
+
+    :Returns:
+        The language name, or None if the package doesn't know it.
+
+    Minted highlights with Pygments, so takes Pygments' names but can't
+    guess the language. Listings has names of its own and many fewer
+    languages.
+
+    """
+    lang = HILITE_OPTIONS.get (lang, lang)
+    if (backend == CB_BACKEND_MINTED):
+        if lang in ('guess', 'none'):
+            return 'text'
+        return lang
+    return LISTINGS_LANGUAGES.get (lang.lower())
+
+
+def passthrough_code (text, lang, backend, linenos=False):
+    """
+    Mark up source code to be highlighted by a LaTeX package.
+
+    :Parameters:
+        text
+            The code to be formatted.
+        lang
+            The language of the source code.
+        backend
+            The package to highlight with, `CB_BACKEND_LISTINGS` or
+            `CB_BACKEND_MINTED`.
+        linenos
+            Whether to number the lines.
+
+    :Returns:
+        The code in the verbatim environment of the package.
+
+    Tabs are replaced as for Pygments-highlighted code.
+
+    """
+    ## Preconditions & preparation:
+    lang = backend_language (lang, backend)
+    text = text.replace ('\t', '   ')
+    ## Main:
+    if (backend == CB_BACKEND_MINTED):
+        options = linenos and '[linenos]' or ''
+        return '\\begin{minted}%s{%s}\n%s\n\\end{minted}' % (options,
+            lang, text)
+    options = []
+    if lang:
+        options.append ('language=' + lang)
+    if linenos:
+        options.append ('numbers=left')
+    options = options and ('[%s]' % ','.join (options)) or ''
+    return '\\begin{lstlisting}%s\n%s\n\\end{lstlisting}' % (options, text)
+
+
+def minimize_latex (text):
+    """
+    Strip comment lines and repeated blank lines from LaTeX.
 
+    :Parameters:
+        text
+            The LaTeX source.
+
+    :Returns:
+        The source without lines that are only a comment, with lines of
+        whitespace emptied and with runs of blank lines reduced to one.
+
+    None of these change what TeX typesets, except in verbatim environments,
+    which are left as they are. Comments at the end of lines are kept, as
+    they may suppress a space.
 
-def wrap_children_in_columns (par_node, children, width=None):
     """
-    Replace this node's children with columns containing the passed children.
+    lines = []
+    verbatim_end = None
+    for line in text.split ('\n'):
+        if verbatim_end:
+            lines.append (line)
+            if (verbatim_end in line):
+                verbatim_end = None
+            continue
+        stripped = line.strip()
+        if stripped.startswith ('%'):
+            continue
+        if not stripped:
+            if lines and not lines[-1]:
+                continue
+            line = ''
+        lines.append (line)
+        match = VERBATIM_BEGIN_RE.search (line)
+        if match:
+            verbatim_end = '\\end{%s}' % match.group (1)
+            if (verbatim_end in line[match.end():]):
+                verbatim_end = None
+    return '\n'.join (lines)
+
+
+PYGMENTS_TOKDEF_RE = re.compile (
+    r'^\\(?:expandafter\\def\\csname |@namedef\{)PY@tok@([^\\}]+)')
+
+def pygments_style_defs (ttypes=None):
+    """
+    Return the Pygments LaTeX style definitions for the given token types.
 
     :Parameters:
-        par_node
-            The node whose children are to be replaced.
-        children
-            The new child nodes, to be wrapped in columns and added to the
-            parent.
-        width
-            The width to be assigned to the columns.
+        ttypes
+            The Pygments token types that appear in the highlighted code,
+            or None for every token type in the style.
 
-    In constructing columns for beamer using either 'simplecolumns' approach,
-    we have to wrap the original elements in column nodes, giving them an
-    appropriate width. Note that this mutates parent node.
+    :Returns:
+        The LaTeX macros needed to typeset the highlighted code.
+
+    `LatexFormatter.get_style_defs` defines a macro for every token type in
+    the style, most of which a given presentation will never use. This keeps
+    the common macros but only those token macros that are used by (or are
+    parents of) the passed types.
     """
     ## Preconditions & preparation:
-    # TODO: check for children and raise error if not?
-    width = width or 0.90
+    from pygments.formatters import LatexFormatter
+    from pygments.token import Token
+    fmtr = LatexFormatter()
     ## Main:
-    # calc width of child columns
-    child_cnt = len (children)
-    col_width = width / child_cnt
-    # set each element of content in a column and add to column set
-    new_children = []
-    for child in children:
-        col = column()
-        col.width = col_width
-        col.append (child)
-        new_children.append (col)
-    par_node.children = new_children
+    if ttypes is None:
+        return fmtr.get_style_defs()
+    # a token is typeset with the names of itself and all its parents
+    used_names = set()
+    for ttype in ttypes:
+        while ttype is not Token:
+            name = fmtr.ttype2name.get (ttype)
+            if name:
+                used_names.add (name)
+            ttype = ttype.parent
+    kept_lines = []
+    for line in fmtr.get_style_defs().split ('\n'):
+        match = PYGMENTS_TOKDEF_RE.match (line)
+        if (match is None) or (match.group (1) in used_names):
+            kept_lines.append (line)
+    return '\n'.join (kept_lines)
+
+
+LATEX_ESCAPES = {
+    '\\':   '\\textbackslash{}',
+    '{':    '\\{',
+    '}':    '\\}',
+    '$':    '\\$',
+    '&':    '\\&',
+    '#':    '\\#',
+    '^':    '\\textasciicircum{}',
+    '_':    '\\_',
+    '%':    '\\%',
+    '~':    '\\textasciitilde{}',
+    ' ':    '~',
+}
 
+def escape_code_text (strn):
+    """
+    Escape a fragment of source code for use outside a verbatim environment.
 
-def has_sub_sections (node):
-    """Test whether or not a section node has children with the
-    tagname section.  The function is going to be used to assess
-    whether or not a certain section is the lowest level.  Sections
-    that have not sub-sections (i.e. no children with the tagname
-    section) are assumed to be Beamer slides"""
-    for child in node.children:
-        if child.tagname == 'section':
-            return True
-    return False
+    :Parameters:
+        strn
+            The text to be escaped.
 
+    :Returns:
+        The text with LaTeX special characters escaped.
 
-def string_to_bool (stringin, default=True):
-    """
-    Turn a commandline arguement string into a boolean value.
+    For example::
+
+        >>> escape_code_text ('a_b {c}')
+        'a\\\\_b~\\\\{c\\\\}'
+
+    Spaces become unbreakable so that indents and alignment survive
+    typesetting in a typewriter font.
     """
-    if type (stringin) == bool:
-        return stringin
-    temp = stringin.lower()
-    if temp not in bool_strs:
-        return default
-    else:
-        return bool_dict[temp]
+    return ''.join ([LATEX_ESCAPES.get (c, c) for c in strn])
 
 
-def highlight_code (text, lang):
+def format_tokens_light (tokens, style='default'):
     """
-    Syntax-highlight source code using Pygments.
+    Mark up a Pygments token stream as plain LaTeX, without verbatim.
 
     :Parameters:
-        text
-            The code to be formatted.
-        lang
-            The language of the source code.
+        tokens
+            An iterable of (token type, value) pairs, as produced by a lexer.
+        style
+            The name of the Pygments style to take colors from.
 
     :Returns:
-        A LaTeX formatted representation of the source code.
+        A LaTeX representation of the source code.
 
+    Each token is escaped and colored with ``\\textcolor`` (and emboldened or
+    italicised as the style dictates), lines are broken explicitly and the
+    whole is set in ``\\texttt``. Unlike the output of Pygments' own
+    `LatexFormatter`, this needs no ``fancyvrb`` environment, no style
+    definitions in the header and no fragile frame.
     """
     ## Preconditions & preparation:
-    from pygments import highlight
-    from pygments.formatters import LatexFormatter
+    from pygments.styles import get_style_by_name
+    style_cls = get_style_by_name (style)
     ## Main:
-    lexer = get_lexer (text, lang)
-    lexer.add_filter('whitespace', tabsize=3, tabs=' ')
-    return highlight (text, lexer, LatexFormatter(tabsize=3))
+    # gather text into lines of (markup template, text) runs, merging
+    # neighbouring runs that are styled the same
+    lines = [[]]
+    for ttype, value in tokens:
+        tstyle = style_cls.style_for_token (ttype)
+        tmpl = '%s'
+        if tstyle['bold']:
+            tmpl = '\\textbf{%s}' % tmpl
+        if tstyle['italic']:
+            tmpl = '\\textit{%s}' % tmpl
+        if tstyle['color']:
+            tmpl = '\\textcolor[HTML]{%s}{%s}' % (tstyle['color'].upper(),
+                tmpl)
+        for i, part in enumerate (value.split ('\n')):
+            if (0 < i):
+                lines.append ([])
+            if not part:
+                continue
+            # color is wasted on whitespace
+            part_tmpl = tmpl
+            if not part.strip():
+                part_tmpl = '%s'
+            curr_line = lines[-1]
+            if (curr_line and (curr_line[-1][0] == part_tmpl)):
+                curr_line[-1][1] += part
+            else:
+                curr_line.append ([part_tmpl, part])
+    # lexers always end on a newline, which must not become an empty line
+    while (lines and not lines[-1]):
+        lines.pop()
+    latex_lines = []
+    for line in lines:
+        if line:
+            latex_lines.append (''.join ([tmpl % escape_code_text (text)
+                for tmpl, text in line]))
+        else:
+            latex_lines.append ('\\mbox{}')
+    ## Postconditions & return:
+    # the braces stop a line starting with '[' or '*' being taken as an
+    # argument to the line break
+    return '\\par\\noindent\\texttt{%%\n%s}\\par\n' % '\\\\{}\n'.join (
+        latex_lines)
 
 
 def get_lexer (text, lang):
@@ -514,8 +1828,21 @@ class block(nodes.container):
     # NOTE: a simple container, has no attributes.
     pass
 
+class continuation_frame (nodes.General, nodes.Element):
+    """
+    A point at which the current frame is ended and continued in another.
+
+    Named as per docutils standards.
+    """
+    # NOTE: has no content or attributes.
+    pass
+
 ### DIRECTIVES
 
+# the directives of a Beamer parse, by name (see `BeamerParser`)
+BEAMER_DIRECTIVES = {}
+
+
 class CodeBlockDirective (Directive):
     """
     Directive for a code block with special highlighting or line numbering
@@ -543,10 +1870,257 @@ class CodeBlockDirective (Directive):
         literal['classes'].append ('code-block')
         literal['language'] = language
         literal['linenos'] = 'linenos' in self.options
+        literal.source, literal.line = \
+            self.state_machine.get_source_and_line (self.lineno)
         return [literal]
 
 for name in ['code-block', 'sourcecode']:
-    directives.register_directive (name, CodeBlockDirective)
+    BEAMER_DIRECTIVES[name] = CodeBlockDirective
+
+
+class BundleFileIO (object):
+    """
+    Stands in for `docutils.io` in the docutils 'include' directive, so that
+    files are read from the source bundle of the conversion.
+
+    :Parameters:
+        settings
+            The settings of the conversion, with its bundle.
+
+    Other than `FileInput`, everything is taken from `docutils.io`.
+    """
+
+    def __init__ (self, settings):
+        self.settings = settings
+        # the directive makes paths relative to the working directory
+        self.bundle_paths = dict ([(os.path.abspath (k), k)
+            for k in settings._source_bundle])
+
+    def __getattr__ (self, name):
+        return getattr (docutils_io, name)
+
+    def FileInput (self, source_path=None, **kwargs):
+        fpath = self.bundle_paths.get (os.path.abspath (source_path),
+            source_path)
+        data = read_bundle_file (self.settings, fpath)
+        return docutils_io.FileInput (source=io.BytesIO (data),
+            source_path=fpath, **kwargs)
+
+
+def with_module_global (func, name, value):
+    """
+    Return a copy of a function, with one of its module globals replaced.
+
+    :Parameters:
+        func
+            The function or method.
+        name
+            The name of the global.
+        value
+            What the name refers to within the copy.
+
+    This changes where a function from another package looks something up,
+    without changing the module (and so other threads) or copying its code.
+    """
+    func = getattr (func, '__func__', func)
+    func_globals = dict (func.__globals__)
+    func_globals[name] = value
+    return types.FunctionType (func.__code__, func_globals, func.__name__,
+        func.__defaults__, func.__closure__)
+
+
+class IncludeDirective (Include):
+    """
+    The docutils 'include' directive, reading from the source bundle of the
+    conversion if it has one (see `convert_bundle`).
+
+    Other than where the file comes from, it is the docutils directive,
+    which is used as is for conversions without a bundle and for the
+    standard ``<...>`` includes that come with docutils.
+    """
+
+    def run (self):
+        settings = self.state.document.settings
+        path = directives.path (self.arguments[0])
+        if ((getattr (settings, '_source_bundle', None) is None) or
+                (path.startswith ('<') and path.endswith ('>'))):
+            return Include.run (self)
+        bundle_io = BundleFileIO (settings)
+        if hasattr (Include, 'read_file'):
+            # later docutils read the file in a method of its own
+            self.read_file = types.MethodType (with_module_global (
+                Include.read_file, 'io', bundle_io), self)
+            return Include.run (self)
+        return with_module_global (Include.run, 'io', bundle_io) (self)
+
+for name in ['include']:
+    BEAMER_DIRECTIVES[name] = IncludeDirective
+
+
+class LiteralIncludeDirective (Directive):
+    """
+    Directive for a code block taken from (part of) an external file.
+
+    Modelled on the Sphinx directive of the same name. The file is mapped
+    into memory rather than read, and only the selected part of it is
+    decoded and passed on for highlighting. Selections are applied in the
+    order 'pyobject', 'start-after' and 'end-before', then 'lines' (counted
+    from the start of what remains).
+    """
+    has_content = False
+    required_arguments = 1
+    optional_arguments = 0
+    final_argument_whitespace = True
+    option_spec = {
+        'language': directives.unchanged_required,
+        'linenos': directives.flag,
+        'lines': directives.unchanged_required,
+        'start-after': directives.unchanged_required,
+        'end-before': directives.unchanged_required,
+        'pyobject': directives.unchanged_required,
+        'encoding': directives.encoding,
+    }
+    selectors = ['pyobject', 'start-after', 'end-before', 'lines']
+    # file hashes, keyed by path, size & modification time, so unchanged
+    # files aren't hashed again
+    digest_cache = LruCache (256)
+    # extracted code, keyed by file hash, encoding & selection
+    slice_cache = LruCache (256)
+
+    def run (self):
+        ## Preconditions & preparation:
+        document = self.state.document
+        settings = document.settings
+        if not settings.file_insertion_enabled:
+            raise self.warning ('"%s" directive disabled.' % self.name)
+        # files are relative to the including document
+        fpath = find_source_file (settings, document.current_source,
+            directives.path (self.arguments[0]))
+        encoding = self.options.get ('encoding',
+            settings.input_encoding or 'utf-8')
+        ## Main:
+        try:
+            code = self.read_selection (fpath, encoding)
+        except (IOError, OSError) as err:
+            raise self.severe ('Problems with "%s" directive path:\n%s.' %
+                (self.name, err))
+        except (ValueError, UnicodeError) as err:
+            raise self.error ('Problems with "%s" directive: %s.' %
+                (self.name, err))
+        settings.record_dependencies.add (fpath)
+        # tabs are expanded, as ReST does for code in the document
+        code = code.expandtabs (settings.tab_width).rstrip ('\n')
+        literal = nodes.literal_block (code, code)
+        literal['classes'].append ('code-block')
+        literal['language'] = self.options.get ('language', 'guess')
+        literal['linenos'] = 'linenos' in self.options
+        literal.source, literal.line = \
+            self.state_machine.get_source_and_line (self.lineno)
+        ## Postconditions & return:
+        return [literal]
+
+    def read_selection (self, fpath, encoding):
+        """
+        Return the selected part of a file, decoded.
+
+        :Parameters:
+            fpath
+                The path to the file.
+            encoding
+                The encoding of the file.
+
+        :Returns:
+            The selected text, which is cached against the file contents.
+            Files are only hashed again if their size or modification time
+            has changed.
+
+        """
+        ## Preconditions & preparation:
+        data = read_bundle_file (self.state.document.settings, fpath)
+        if (data is not None):
+            return self.select_code (data, file_digest (data), encoding)
+        ## Main:
+        infile = open (fpath, 'rb')
+        try:
+            fstat = os.fstat (infile.fileno())
+            stamp = (os.path.abspath (fpath), fstat.st_size, fstat.st_mtime)
+            digest = self.digest_cache.get (stamp)
+            if (digest is not None):
+                code = self.slice_cache.get (self.selection_key (digest,
+                    encoding))
+                if (code is not None):
+                    return code
+            # empty files can't be mapped
+            if fstat.st_size:
+                data = mmap.mmap (infile.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                data = b''
+            try:
+                if (digest is None):
+                    digest = file_digest (data)
+                    self.digest_cache.put (stamp, digest)
+                code = self.select_code (data, digest, encoding)
+            finally:
+                if data:
+                    data.close()
+        finally:
+            infile.close()
+        ## Postconditions & return:
+        return code
+
+    def selection_key (self, digest, encoding):
+        """
+        Return the key of the selected code in the cache.
+        """
+        selection = tuple ([(x, self.options.get (x)) for x in self.selectors])
+        return (digest, encoding, selection)
+
+    def select_code (self, data, digest, encoding):
+        """
+        Return the selected part of the file contents (a string or mmap, with
+        the given hash), decoded.
+        """
+        key = self.selection_key (digest, encoding)
+        code = self.slice_cache.get (key)
+        if (code is None):
+            code = u''.join ([data[start:end].decode (encoding)
+                for start, end in self.select_ranges (data, encoding)])
+            self.slice_cache.put (key, code)
+        return code
+
+    def select_ranges (self, data, encoding):
+        """
+        Return the byte ranges of the file that the options select.
+        """
+        start, end = 0, len (data)
+        pyobject = self.options.get ('pyobject')
+        if pyobject:
+            start, end = find_pyobject (data, pyobject.encode (encoding),
+                start, end)
+        start_after = self.options.get ('start-after')
+        if start_after:
+            posn = data.find (start_after.encode (encoding), start, end)
+            if (posn == -1):
+                raise ValueError ('start-after text "%s" not found' %
+                    start_after)
+            # start on the following line
+            posn = data.find (b'\n', posn, end)
+            start = (posn == -1) and end or (posn + 1)
+        end_before = self.options.get ('end-before')
+        if end_before:
+            posn = data.find (end_before.encode (encoding), start, end)
+            if (posn == -1):
+                raise ValueError ('end-before text "%s" not found' %
+                    end_before)
+            # end at the start of the line
+            end = data.rfind (b'\n', start, posn) + 1 or start
+        lines = self.options.get ('lines')
+        if lines:
+            return select_lines (data, parse_line_ranges (lines), start, end)
+        return [(start, end)]
+
+for name in ['literalinclude']:
+    BEAMER_DIRECTIVES[name] = LiteralIncludeDirective
 
 
 class SimpleColsDirective (Directive):
@@ -577,13 +2151,15 @@ class SimpleColsDirective (Directive):
         # make columnset
         text = '\n'.join (self.content)
         cset = columnset (text)
+        cset.source, cset.line = self.state_machine.get_source_and_line (
+            self.lineno)
         # wrap children in columns & set widths
         wrap_children_in_columns (cset, dummy.children, width)
         ## Postconditions & return:
         return [cset]
 
 for name in ['r2b-simplecolumns', 'r2b_simplecolumns']:
-    directives.register_directive (name, SimpleColsDirective)
+    BEAMER_DIRECTIVES[name] = SimpleColsDirective
 
 
 class ColumnSetDirective (Directive):
@@ -618,6 +2194,8 @@ class ColumnSetDirective (Directive):
         # make columnset
         text = '\n'.join (self.content)
         cset = columnset (text)
+        cset.source, cset.line = self.state_machine.get_source_and_line (
+            self.lineno)
         # parse content of columnset
         self.state.nested_parse (self.content, self.content_offset, cset)
         # survey widths
@@ -649,7 +2227,7 @@ class ColumnSetDirective (Directive):
         return [cset]
 
 for name in ['r2b-columnset', 'r2b_columnset']:
-    directives.register_directive (name, ColumnSetDirective)
+    BEAMER_DIRECTIVES[name] = ColumnSetDirective
 
 
 class ColumnDirective (Directive):
@@ -679,6 +2257,8 @@ class ColumnDirective (Directive):
         # make columnset
         text = '\n'.join (self.content)
         col = column (text)
+        col.source, col.line = self.state_machine.get_source_and_line (
+            self.lineno)
         col.width = width
         # parse content of column
         self.state.nested_parse (self.content, self.content_offset, col)
@@ -687,7 +2267,7 @@ class ColumnDirective (Directive):
         return [col]
 
 for name in ['r2b-column', 'r2b_column']:
-    directives.register_directive (name, ColumnDirective)
+    BEAMER_DIRECTIVES[name] = ColumnDirective
 
 
 class NoteDirective (Directive):
@@ -709,13 +2289,15 @@ class NoteDirective (Directive):
         # make columnset
         text = '\n'.join (self.content)
         note_node = beamer_note (text)
+        note_node.source, note_node.line = \
+            self.state_machine.get_source_and_line (self.lineno)
         # parse content of note
         self.state.nested_parse (self.content, self.content_offset, note_node)
         ## Postconditions & return:
         return [note_node]
 
 for name in ['r2b-note', 'r2b_note']:
-    directives.register_directive (name, NoteDirective)
+    BEAMER_DIRECTIVES[name] = NoteDirective
 
 
 class beamer_section (Directive):
@@ -744,90 +2326,492 @@ class beamer_section (Directive):
         section_node.tagname = 'beamer_section'
         return [section_node]
 
-for name in ['beamer_section', 'r2b-section', 'r2b_section']:
-    directives.register_directive (name, beamer_section)
+for name in ['beamer_section', 'r2b-section', 'r2b_section']:
+    BEAMER_DIRECTIVES[name] = beamer_section
+
+
+class onlybeamer_directive (Directive):
+    """
+    A directive that encloses its content in \only<beamer>{content} so
+    that the content shows up in the presentation and not in the
+    handouts or article version.
+    """
+    required_arguments = 0
+    optional_arguments = 0
+    final_argument_whitespace = True
+    has_content = True
+    option_spec = {'handouttext': str}
+
+    def run (self):
+        ## Preconditions:
+        self.assert_has_content()
+        # get and check width of column set
+        text = '\n'.join (self.content)
+        only_beamer_set = onlybeamer(text)
+        handouttext = self.options.get ('handouttext', '')
+        only_beamer_set.handouttext = handouttext
+        # parse content of columnset
+        self.state.nested_parse (self.content, self.content_offset, \
+                                 only_beamer_set)
+        # survey widths
+        return [only_beamer_set]
+
+
+class block_directive (Directive):
+    """
+    A directive that encloses its content in
+    \begin{block}{title}
+       content
+    \end{block}
+    """
+    required_arguments = 1
+    optional_arguments = 0
+    final_argument_whitespace = True
+    has_content = True
+    option_spec = {}
+
+    def run (self):
+        ## Preconditions:
+        self.assert_has_content()
+        title = self.arguments[0]
+        # get and check width of column set
+        text = '\n'.join (self.content)
+        body_set = block(text)
+        # parse content of columnset
+        self.state.nested_parse (self.content, self.content_offset, \
+                                 body_set)
+        # survey widths
+        text_node = nodes.Text (title)
+        text_nodes = [text_node]        
+        title_node = nodes.title (title, '', *text_nodes)
+        mynodes = [body_set]
+        body_set.title = title
+        #mynodes += title_node
+        #pdb.set_trace()
+        return [body_set]
+
+
+BEAMER_DIRECTIVES['block'] = block_directive
+BEAMER_DIRECTIVES['onlybeamer'] = onlybeamer_directive
+
+
+class StreamingCsvTableDirective (Directive):
+    """
+    A directive for a table read from a CSV file, split across frames.
+
+    Unlike the docutils 'csv-table' directive, the file is read row by row,
+    only the selected rows and columns are kept, and reading stops after the
+    last selected row. Cells are taken as plain text rather than parsed as
+    ReST. If a number of rows per frame is given, the table is split into
+    several, each but the first in a continuation of the enclosing frame and
+    each repeating the header rows.
+    """
+    has_content = False
+    required_arguments = 1
+    optional_arguments = 0
+    final_argument_whitespace = True
+    option_spec = {
+        'header-rows': directives.nonnegative_int,
+        'rows': directives.unchanged_required,
+        'columns': directives.unchanged_required,
+        'rows-per-frame': directives.nonnegative_int,
+        'delim': directives.single_char_or_whitespace_or_unicode,
+        'encoding': directives.encoding,
+    }
+
+    def run (self):
+        ## Preconditions & preparation:
+        document = self.state.document
+        settings = document.settings
+        if not settings.file_insertion_enabled:
+            raise self.warning ('"%s" directive disabled.' % self.name)
+        fpath = find_source_file (settings, document.current_source,
+            directives.path (self.arguments[0]))
+        encoding = self.options.get ('encoding',
+            settings.input_encoding or 'utf-8')
+        ## Main:
+        try:
+            header_rows, body_rows = self.read_rows (fpath, encoding)
+        except (IOError, OSError) as err:
+            raise self.severe ('Problems with "%s" directive path:\n%s.' %
+                (self.name, err))
+        except (ValueError, UnicodeError, csv.Error) as err:
+            raise self.error ('Problems with "%s" directive: %s.' %
+                (self.name, err))
+        settings.record_dependencies.add (fpath)
+        # split rows between frames, sizing columns alike in all of them
+        col_widths = table_col_widths (header_rows + body_rows)
+        per_frame = self.options.get ('rows-per-frame') or len (body_rows)
+        table_nodes = []
+        for i in range (0, max (len (body_rows), 1), max (per_frame, 1)):
+            if table_nodes:
+                table_nodes.append (continuation_frame())
+            table_nodes.append (build_table (header_rows,
+                body_rows[i:i + per_frame], col_widths))
+        ## Postconditions & return:
+        return table_nodes
+
+    def read_rows (self, fpath, encoding):
+        """
+        Read the selected header and body rows from a CSV file.
+
+        :Parameters:
+            fpath
+                The path to the CSV file.
+            encoding
+                The encoding of the file.
+
+        :Returns:
+            A pair of lists of header and body rows, each row a list of
+            (unicode) cells.
+
+        """
+        ## Preconditions & preparation:
+        header_cnt = self.options.get ('header-rows', 0)
+        row_ranges = parse_line_ranges (self.options.get ('rows', '1-'))
+        last_rows = [last for first, last in row_ranges]
+        if (None in last_rows):
+            last_row = None
+        else:
+            last_row = max (last_rows)
+        col_ranges = None
+        if ('columns' in self.options):
+            col_ranges = parse_line_ranges (self.options['columns'])
+        delim = self.options.get ('delim', ',')
+        ## Main:
+        header_rows = []
+        body_rows = []
+        infile, reader = open_csv_reader (fpath, encoding, delim,
+            read_bundle_file (self.state.document.settings, fpath))
+        try:
+            for row_num, row in enumerate (reader):
+                if (col_ranges is not None):
+                    row = select_columns (row, col_ranges)
+                if (row_num < header_cnt):
+                    header_rows.append (row)
+                    continue
+                row_num -= header_cnt - 1
+                if (last_row is not None) and (last_row < row_num):
+                    break
+                for first, last in row_ranges:
+                    if (first <= row_num) and ((last is None) or
+                            (row_num <= last)):
+                        body_rows.append (row)
+                        break
+        finally:
+            infile.close()
+        ## Postconditions & return:
+        return header_rows, body_rows
+
+for name in ['r2b-csv-table', 'r2b_csv_table']:
+    BEAMER_DIRECTIVES[name] = StreamingCsvTableDirective
+
+
+def register_directives ():
+    """
+    Register the Beamer directives with docutils, for all parsers.
+
+    A `BeamerParser` finds the directives without this. It is only needed to
+    use them with another parser (e.g. if only the writer is passed to the
+    docutils publishing functions), and affects every later parse in the
+    process, whatever its writer.
+    """
+    for name, directive_cls in BEAMER_DIRECTIVES.items():
+        directives.register_directive (name, directive_cls)
+
+
+### PARSER
+
+def beamer_directive (self, match, **option_presets):
+    """
+    Look up and run a directive, preferring the Beamer directives.
+
+    Replaces `Body.directive` among the explicit markup constructs of the
+    states of a `BeamerParser`.
+    """
+    type_name = match.group (1)
+    directive_cls = BEAMER_DIRECTIVES.get (type_name.lower())
+    if directive_cls is None:
+        return rst_states.Body.directive (self, match, **option_presets)
+    return self.run_directive (directive_cls, match, type_name,
+        option_presets)
+
+
+# the explicit markup of the Beamer states, as `Body.explicit` but for the
+# directive lookup
+BEAMER_EXPLICIT = rst_states.Struct (
+    patterns=rst_states.Body.explicit.patterns,
+    constructs=[(beamer_directive, pattern)
+        if (method is rst_states.Body.__dict__['directive'])
+        else (method, pattern)
+        for method, pattern in rst_states.Body.explicit.constructs])
+
+
+def make_beamer_state (state_cls):
+    """
+    Derive the Beamer version of a ReST parser state.
+
+    The state keeps its name (which is how state machines refer to it), but
+    parses nested content with the Beamer states rather than the docutils
+    defaults, and has a cache of nested state machines of its own rather
+    than sharing the one of all states.
+    """
+    def __init__ (self, state_machine, debug=False):
+        state_cls.__init__ (self, state_machine, debug)
+        # updated in place, as the indented-block kwargs are the same dict
+        self.nested_sm_kwargs['state_classes'] = BEAMER_STATE_CLASSES
+        self.nested_sm_cache = []
+    attrs = {'__init__': __init__}
+    if issubclass (state_cls, rst_states.Body):
+        attrs['explicit'] = BEAMER_EXPLICIT
+    return type (state_cls) (state_cls.__name__, (state_cls,), attrs)
+
+
+BEAMER_STATE_CLASSES = tuple ([make_beamer_state (x) for x in
+    rst_states.state_classes])
+
+
+def find_section_titles (lines):
+    """
+    Find the section titles of a document by their adornment.
 
+    :Parameters:
+        lines
+            The lines of the document.
 
-class onlybeamer_directive (Directive):
+    :Returns:
+        A list of (first line, line after, style) for each title, where the
+        style is the adornment character and whether it is overlined.
+
+    This is a quick scan rather than a parse, so unusual markup (e.g. a simple
+    table of one column) can be mistaken for a title, but the titles of an
+    ordinary document are all found.
     """
-    A directive that encloses its content in \only<beamer>{content} so
-    that the content shows up in the presentation and not in the
-    handouts or article version.
+    titles = []
+    num_lines = len (lines)
+    i = 0
+    while (i + 1 < num_lines):
+        line = lines[i].rstrip()
+        if line and ((i == 0) or not lines[i-1].strip()):
+            over = SECTION_ADORNMENT_RE.match (line)
+            if over:
+                # overline, title, and underline the same as the overline
+                if ((i + 2 < num_lines) and lines[i+1].strip() and
+                        (lines[i+2].rstrip() == line)):
+                    titles.append ((i, i + 3, (line[0], True)))
+                    i += 3
+                    continue
+            elif not line[0].isspace():
+                under = lines[i+1].rstrip()
+                if (SECTION_ADORNMENT_RE.match (under) and
+                        ((len (line) <= len (under)) or (4 <= len (under)))):
+                    titles.append ((i, i + 2, (under[0], False)))
+                    i += 2
+                    continue
+        i += 1
+    return titles
+
+
+def select_frame_lines (lines, frame=None, line=None):
     """
-    required_arguments = 0
-    optional_arguments = 0
-    final_argument_whitespace = True
-    has_content = True
-    option_spec = {'handouttext': str}
-
-    def run (self):
-        ## Preconditions:
-        self.assert_has_content()
-        # get and check width of column set
-        text = '\n'.join (self.content)
-        only_beamer_set = onlybeamer(text)
-        handouttext = self.options.get ('handouttext', '')
-        only_beamer_set.handouttext = handouttext
-        # parse content of columnset
-        self.state.nested_parse (self.content, self.content_offset, \
-                                 only_beamer_set)
-        # survey widths
-        return [only_beamer_set]
+    Select the lines of the source needed to convert a single frame.
 
+    :Parameters:
+        lines
+            The lines of the document.
+        frame
+            The number of the frame, counting from 1.
+        line
+            A line in the frame (counting from 1), if `frame` isn't given.
 
-class block_directive (Directive):
+    :Returns:
+        A sorted list of (first, last) line ranges to convert, the number of
+        sections at each level of the whole document, and the number of
+        frames. The ranges are None if there's no such frame.
+
+    The frames are the sections without subsections. Selected are the
+    document header (before the first title), the frame, each enclosing
+    section up to its first subsection (so that the frame keeps its level,
+    and the document title and docinfo are kept), and any target and
+    substitution definitions (so that references still resolve).
     """
-    A directive that encloses its content in
-    \begin{block}{title}
-       content
-    \end{block}
+    ## Preconditions & preparation:
+    titles = find_section_titles (lines)
+    num_lines = len (lines)
+    styles = []
+    levels = []
+    for first, after, style in titles:
+        if style not in styles:
+            styles.append (style)
+        levels.append (styles.index (style))
+    starts = [x[0] for x in titles] + [num_lines]
+    frames = [i for i in range (len (titles))
+        if (i + 1 == len (titles)) or (levels[i+1] <= levels[i])]
+    level_counts = [levels.count (x) for x in range (len (styles))]
+    ## Main:
+    if frame is None:
+        frame = len ([i for i in frames if starts[i] < line]) or 1
+    if not (1 <= frame <= len (frames)):
+        return None, level_counts, len (frames)
+    posn = frames[frame - 1]
+    ranges = [(0, starts[0]), (starts[posn], starts[posn + 1])]
+    level = levels[posn]
+    for i in range (posn - 1, -1, -1):
+        if levels[i] < level:
+            ranges.append ((starts[i], starts[i + 1]))
+            level = levels[i]
+    i = 0
+    while (i < num_lines):
+        if lines[i].startswith (('.. _', '.. |', '__ ')):
+            first = i
+            i += 1
+            while ((i < num_lines) and lines[i][:1].isspace() and
+                    lines[i].strip()):
+                i += 1
+            ranges.append ((first, i))
+        else:
+            i += 1
+    ## Postconditions & return:
+    ranges.sort()
+    merged = []
+    for first, last in ranges:
+        if merged and (first <= merged[-1][1]):
+            merged[-1] = (merged[-1][0], max (last, merged[-1][1]))
+        elif (first < last):
+            merged.append ((first, last))
+    return merged, level_counts, len (frames)
+
+
+class PreviewDocTitle (DocTitle):
     """
-    required_arguments = 1
-    optional_arguments = 0
-    final_argument_whitespace = True
-    has_content = True
-    option_spec = {}
+    Promote the title and subtitle of a frame preview as in the whole document.
 
-    def run (self):
-        ## Preconditions:
-        self.assert_has_content()
-        title = self.arguments[0]
-        # get and check width of column set
-        text = '\n'.join (self.content)
-        body_set = block(text)
-        # parse content of columnset
-        self.state.nested_parse (self.content, self.content_offset, \
-                                 body_set)
-        # survey widths
-        text_node = nodes.Text (title)
-        text_nodes = [text_node]        
-        title_node = nodes.title (title, '', *text_nodes)
-        mynodes = [body_set]
-        body_set.title = title
-        #mynodes += title_node
-        #pdb.set_trace()
-        return [body_set]
+    A preview has only one section at each level above its frame, which
+    docutils would promote to the document title and subtitle even if the
+    whole document has several. Instead, the parser decides what to promote
+    and turns off the usual promotion.
+    """
+    default_priority = 319
+
+    def apply (self):
+        promote = getattr (self.document.settings, '_preview_promote', None)
+        if promote is None:
+            return
+        promote_title, promote_subtitle = promote
+        if promote_title and self.promote_title (self.document):
+            if promote_subtitle:
+                self.promote_subtitle (self.document)
+        self.set_metadata()
 
 
-directives.register_directive('block', block_directive)
-directives.register_directive('onlybeamer', onlybeamer_directive)
+class BeamerParser (RstParser):
+    """
+    A ReST parser that understands the Beamer directives.
+
+    The directives are only seen by the parses of this parser, rather than
+    being registered globally, so conversions with and without them can run
+    side by side in one process.
+
+    If a single frame is to be previewed (the ``--frame`` and
+    ``--frame-at-line`` options), only the lines of the source needed for it
+    are parsed, keeping their line numbers for error messages.
+    """
+    def __init__ (self, rfc2822=False, inliner=None):
+        RstParser.__init__ (self, rfc2822, inliner)
+        self.state_classes = BEAMER_STATE_CLASSES
+
+    def get_transforms (self):
+        return RstParser.get_transforms (self) + [PreviewDocTitle]
+
+    def parse (self, inputstring, document):
+        settings = document.settings
+        frame = getattr (settings, 'preview_frame', None)
+        line = getattr (settings, 'preview_line', None)
+        if (frame is None) and (line is None):
+            return RstParser.parse (self, inputstring, document)
+        self.setup_parse (inputstring, document)
+        self.statemachine = rst_states.RSTStateMachine (
+            state_classes=self.state_classes,
+            initial_state=self.initial_state,
+            debug=document.reporter.debug_flag)
+        inputlines = self.preview_lines (inputstring, document, frame, line)
+        if inputlines is not None:
+            self.statemachine.run (inputlines, document,
+                inliner=self.inliner)
+        self.finish_parse()
+
+    def preview_lines (self, inputstring, document, frame, line):
+        """
+        Return the lines to parse to preview a frame, as a `StringList`.
+        """
+        ## Preconditions & preparation:
+        settings = document.settings
+        source = document.get ('source')
+        raw_lines = inputstring.splitlines()
+        ranges, level_counts, num_frames = select_frame_lines (raw_lines,
+            frame, line)
+        if ranges is None:
+            document += document.reporter.severe (
+                'No frame %s to preview; the document has %s frames.' %
+                (frame, num_frames))
+            return None
+        ## Main:
+        # promote titles as for the whole document (see `PreviewDocTitle`)
+        if settings.doctitle_xform:
+            settings.doctitle_xform = False
+            settings._preview_promote = (level_counts[:1] == [1],
+                level_counts[:2] == [1, 1])
+        inputlines = StringList()
+        for first, last in ranges:
+            if inputlines and inputlines[-1]:
+                inputlines.append ('', source, first - 1)
+            region = string2lines ('\n'.join (raw_lines[first:last]),
+                tab_width=settings.tab_width, convert_whitespace=True)
+            inputlines.extend (StringList (region,
+                items=[(source, first + i) for i in range (len (region))]))
+        ## Postconditions & return:
+        return inputlines
 
 ### WRITER
 
 class BeamerTranslator (LaTeXTranslator):
     """
     A converter for docutils elements to beamer-flavoured latex.
+
+    Code is highlighted with a time limit by `cb_worker`, a `HighlightWorker`
+    owned by the writer, if one is given.
     """
 
-    def __init__ (self, document):
+    def __init__ (self, document, cb_worker=None):
         LaTeXTranslator.__init__ (self, document)
 
         self.organization = None#used for Beamer title and possibly
                                 #header/footer.  Set from docinfo 
         # record the the settings for codeblocks
         self.cb_use_pygments = document.settings.cb_use_pygments
+        self.cb_backend = document.settings.cb_backend
+        if (self.cb_backend is None):
+            if self.cb_use_pygments:
+                self.cb_backend = CB_BACKEND_PYGMENTS
+            else:
+                self.cb_backend = CB_BACKEND_PLAIN
+        # a draft is made for compiling speed rather than fidelity
+        self.draft = document.settings.draft
+        if self.draft:
+            self.cb_backend = CB_BACKEND_PLAIN
+            self.requirements['draft'] = DRAFT_SETUP
         self.cb_replace_tabs = document.settings.cb_replace_tabs
         self.cb_default_lang = document.settings.cb_default_lang
+        self.cb_formatter = document.settings.cb_formatter
+        self.cb_worker = None
+        if (self.cb_backend == CB_BACKEND_PYGMENTS):
+            self.cb_worker = cb_worker
+        # codeblocks that took too long to highlight, so are set as plain
+        self.cb_plain_nodes = set()
+        # codeblocks highlighted together by language, if done in batches
+        self.cb_batch = (document.settings.cb_batch and
+            (self.cb_worker is None))
+        self.cb_batched = None
 
         self.head_prefix = [x for x in self.head_prefix
             if ('{typearea}' not in x)]
@@ -851,14 +2835,10 @@ class BeamerTranslator (LaTeXTranslator):
             '}\n',
         ])
 
-        if (self.cb_use_pygments):
-            #from pygments.formatters import LatexFormatter
-            #fmtr = LatexFormatter()
-            self.head_prefix.extend ([
-                '\\usepackage{fancyvrb}\n',
-                '\\usepackage{color}\n',
-                #LatexFormatter().get_style_defs(),
-            ])
+        # Pygments packages & style defs are only added (in `depart_document`)
+        # if code was actually highlighted, but the packages go here
+        self.cb_token_types = set()
+        self.pygments_posn = len (self.head_prefix)
 
         # set appropriate header options for theming
         theme = document.settings.theme
@@ -867,6 +2847,8 @@ class BeamerTranslator (LaTeXTranslator):
 
         # set appropriate header options for note display
         shownotes = document.settings.shownotes
+        if self.draft:
+            shownotes = SHOWNOTES_FALSE
         if shownotes == SHOWNOTES_TRUE:
             shownotes = SHOWNOTES_RIGHT
         use_pgfpages = True
@@ -892,13 +2874,6 @@ class BeamerTranslator (LaTeXTranslator):
             self.head_prefix.append ('\\usepackage{pgfpages}\n')
         self.head_prefix.append ('\\setbeameroption{%s}\n' % option_str)
 
-        if (self.cb_use_pygments):
-            from pygments.formatters import LatexFormatter
-            fmtr = LatexFormatter()
-            self.head_prefix.extend ([
-                LatexFormatter().get_style_defs(),
-            ])
-
         self.overlay_bullets = string_to_bool (document.settings.overlaybullets, False)
         self.fragile_default = string_to_bool (document.settings.fragile_default, True)
         self.shortauthor = document.settings.shortauthor
@@ -912,20 +2887,145 @@ class BeamerTranslator (LaTeXTranslator):
         self.in_column = False
         self.in_note = False
         self.frame_level = 0
+        # content that may be repeated, keyed by what identifies a copy
+        self.dedupe = document.settings.dedupe
+        self.dedupe_entries = {}
+        self.dedupe_saved = []
+        # top-level sections written to files of their own
+        self.split_output = document.settings.split_output
+        self.split_files = []
+        self.in_split_section = False
+        # replace per-node setup with definitions in the preamble?
+        self.minimize_output = document.settings.minimize_output
+        # the simple table being set as a tabular, if any
+        self.simple_table = None
+        self.simple_table_stack = []
+        # the number and title of the current frame, if in one
+        self.frame_cnt = 0
+        self.current_frame = None
+        # the notes of each frame, if written to a file of their own
+        self.notes_file = document.settings.notes_file
+        self.frame_notes = []
+        # what is in each frame, for estimating their cost to compile
+        self.notes_mode = shownotes
+        self.frame_cost_report = document.settings.frame_cost_report
+        self.frame_costs = None
+        if (self.frame_cost_report is not None):
+            self.frame_costs = []
+        self.frame_stats = None
+        # whether only one frame was parsed (see `BeamerParser`)
+        self.preview = ((document.settings.preview_frame is not None) or
+            (document.settings.preview_line is not None))
 
         # this fixes the hardcoded section titles in docutils 0.4
         self.d_class = DocumentClass ('article')
 
+        # the visit & depart functions by node class name, and whether calls
+        # are to be traced as the docutils dispatch does
+        self.dispatch_table = self.get_dispatch_table()
+        self.dispatch_debug = document.settings.debug
+
+    @classmethod
+    def get_dispatch_table (cls):
+        """
+        Return the table of visit & depart functions for this class.
+
+        The table maps each node class name (tagname) that has a visit or
+        depart method to the pair of functions to call, with the unknown-node
+        handlers filling in for a missing one. It is built on first use and
+        then shared by all translators of the class.
+        """
+        table = cls.__dict__.get ('_dispatch_table')
+        if table is None:
+            def func (name):
+                method = getattr (cls, name)
+                return getattr (method, '__func__', method)
+            tagnames = set ([x.split ('_', 1)[1] for x in dir (cls)
+                if x.startswith ('visit_') or x.startswith ('depart_')])
+            table = {}
+            for tagname in tagnames:
+                table[tagname] = (
+                    func (('visit_' + tagname) if hasattr (cls,
+                        'visit_' + tagname) else 'unknown_visit'),
+                    func (('depart_' + tagname) if hasattr (cls,
+                        'depart_' + tagname) else 'unknown_departure'),
+                )
+            table[None] = (func ('unknown_visit'),
+                func ('unknown_departure'))
+            cls._dispatch_table = table
+        return table
+
+    def dispatch_visit (self, node):
+        """
+        Call the visit method for `node` by a lookup in the dispatch table.
+        """
+        if self.dispatch_debug:
+            return LaTeXTranslator.dispatch_visit (self, node)
+        table = self.dispatch_table
+        funcs = table.get (node.__class__.__name__) or table[None]
+        return funcs[0] (self, node)
+
+    def dispatch_departure (self, node):
+        """
+        Call the depart method for `node` by a lookup in the dispatch table.
+        """
+        if self.dispatch_debug:
+            return LaTeXTranslator.dispatch_departure (self, node)
+        table = self.dispatch_table
+        funcs = table.get (node.__class__.__name__) or table[None]
+        return funcs[1] (self, node)
+
 
     def depart_document(self, node):
+        if (self.frame_costs is not None):
+            self.report_frame_costs (self.frame_cost_report)
         # Complete header with information gained from walkabout
         # a) conditional requirements (before style sheet)
-        self.requirements = self.requirements.sortedvalues()
+        self.requirements = [self.requirements[key]
+            for key in sorted (self.requirements)]
         # b) coditional fallback definitions (after style sheet)
-        self.fallbacks = self.fallbacks.sortedvalues()
+        self.fallbacks = [self.fallbacks[key]
+            for key in sorted (self.fallbacks)]
         # c) PDF properties
         self.pdfsetup.append(PreambleCmds.linking % self.hyperref_options)
-
+        # d) Pygments style definitions, only for the tokens actually used.
+        #    (The light formatter needs neither these nor fancyvrb.) A
+        #    preamble file may be shared with other decks, so it gets all.
+        if (self.cb_token_types and
+                (self.cb_formatter == CB_FORMATTER_VERBATIM)):
+            self.head_prefix[self.pygments_posn:self.pygments_posn] = [
+                '\\usepackage{fancyvrb}\n',
+                '\\usepackage{color}\n',
+            ]
+            if self.document.settings.preamble_file:
+                self.head_prefix.append (pygments_style_defs())
+            else:
+                self.head_prefix.append (
+                    pygments_style_defs (self.cb_token_types))
+        # e) saved copies of repeated content, defined before the title. As
+        #    they belong to this deck, they're in the body, not the preamble.
+        saved_defs = []
+        for entry in self.dedupe_saved:
+            if (entry['kind'] == DEDUPE_CODE_MACRO):
+                saved_defs.append ('\\newcommand{\\%s}{%%\n%s}\n' %
+                    (entry['name'], entry['content']))
+            else:
+                saved_defs.append ('\\newsavebox{\\%s}%%\n'
+                    '\\begin{lrbox}{\\%s}%%\n%s%%\n\\end{lrbox}\n' %
+                    (entry['name'], entry['name'], entry['content']))
+        self.body_pre_docinfo[0:0] = saved_defs
+        # f) sections for output to files of their own
+        if (self.split_output):
+            self.write_split_files()
+        # g) notes for reading while presenting
+        if (self.notes_file):
+            self.write_notes_file()
+
+        # later docutils take the PDF title from the document, at the end
+        if (self.document.get ('title') and
+                not [x for x in self.pdfinfo if ('pdftitle=' in x)]):
+            self.pdfinfo.insert (0, '  pdftitle={%s},' %
+                self.encode (self.document['title']))
         if self.pdfauthor:
             authors = self.author_separator.join(self.pdfauthor)
             self.pdfinfo.append('  pdfauthor={%s}' % authors)
@@ -937,9 +3037,11 @@ class BeamerTranslator (LaTeXTranslator):
         #       we do not want LaTeX author/date handling (via \maketitle).
         #       To deactivate it, we add \title, \author, \date,
         #       even if the arguments are empty strings.
-        if self.title or self.author_stack or self.date:
-            authors = ['\\\\\n'.join(author_entry)
-                       for author_entry in self.author_stack]
+        # (later docutils start with an empty author entry)
+        author_stack = [x for x in self.author_stack if ''.join (x)]
+        if self.title or author_stack or self.date:
+            authors = ['\\\\\n'.join(filter(None, author_entry))
+                       for author_entry in author_stack]
             title = [''.join(self.title)] + self.title_labels
             if self.shorttitle:
                 shorttitle = self.shorttitle
@@ -960,14 +3062,21 @@ class BeamerTranslator (LaTeXTranslator):
                             ' \\and\n'.join(authors),
                             ', '.join(self.date)]
             if self.organization is None:
-                docinfo_str = PreambleCmds.documenttitle % tuple(docinfo_list)
+                docinfo_str = docinfo_title % tuple(docinfo_list)
             else:
                 docinfo_list.append(self.organization)
                 docinfo_str = docinfo_w_institute % tuple(docinfo_list)
+            if self.preview:
+                # a preview is of the frame alone, without a title page
+                docinfo_str = docinfo_str.replace ('\\maketitle\n', '')
             self.body_pre_docinfo.append(docinfo_str)
         # b) bibliography
         # TODO insertion point of bibliography should be configurable.
-        if self._use_latex_citations and len(self._bibitems)>0:
+        if hasattr (self, 'append_bibliogaphy'):
+            # later docutils
+            if self._bibitems:
+                self.append_bibliogaphy()
+        elif self._use_latex_citations and len(self._bibitems)>0:
             if not self.bibtex:
                 widest_label = ''
                 for bi in self._bibitems:
@@ -991,8 +3100,11 @@ class BeamerTranslator (LaTeXTranslator):
 
 
 
-    def visit_docinfo_item(self, node, name):
-        if name == 'author':
+    def visit_docinfo_item(self, node, name=None):
+        # later docutils don't pass the name, and record the author first
+        if name is None:
+            name = node.tagname
+        elif name == 'author':
             self.pdfauthor.append(self.attval(node.astext()))
         if self.use_latex_docinfo:
             if name in ('author', 'contact', 'address'):
@@ -1041,13 +3153,51 @@ class BeamerTranslator (LaTeXTranslator):
         return res
 
 
+    def to_latex_length (self, length_str, node=None):
+        # later docutils parse lengths, so can't take a LaTeX one as given
+        if ('\\' in length_str):
+            return length_str
+        return LaTeXTranslator.to_latex_length (self, length_str, node)
+
     def visit_image(self, node):
         attrs = node.attributes
         if not 'align' in attrs and self.centerfigs:
             attrs['align'] = 'center'
         if ('height' not in attrs) and ('width' not in attrs):
             attrs['height'] = '0.75\\textheight'
+        if (self.frame_stats is not None):
+            self.frame_stats['images'].append (attrs['uri'])
+        # recorded if found beside the source, so builds that track
+        # dependencies know to convert again when the image changes
+        imagepath = find_source_file (self.settings,
+            self.document.get ('source'), attrs['uri'])
+        bundle = getattr (self.settings, '_source_bundle', None)
+        if (bundle is not None):
+            # images aren't read, but can at least be checked for
+            if (imagepath in bundle):
+                self.settings.record_dependencies.add (imagepath)
+            else:
+                self.document.reporter.warning (
+                    'Image "%s" is not in the source bundle.' % attrs['uri'],
+                    base_node=node)
+        elif os.path.isfile (imagepath):
+            self.settings.record_dependencies.add (imagepath)
+        start_posn = len (self.out)
         LaTeXTranslator.visit_image(self, node)
+        if (self.minimize_output):
+            for posn in range (start_posn, len (self.out)):
+                if (self.out[posn] == '\\noindent\\makebox[\\textwidth][c]{'):
+                    self.fallbacks['rtbcenter'] = RTBCENTER_DEF
+                    self.out[posn] = '\\rtbcenter{'
+        if (self.dedupe):
+            # only boxes with a size independent of where they are used
+            posn = index (self.out[start_posn:],
+                lambda x: x.startswith ('\\includegraphics'))
+            if (posn is not None):
+                posn += start_posn
+                if ('\\linewidth' not in self.out[posn]):
+                    self.dedupe_output (('image', self.out[posn]),
+                        DEDUPE_IMAGE_BOX, posn=posn)
 
         ## #Old approach
         ## if self.centerfigs:
@@ -1125,21 +3275,163 @@ class BeamerTranslator (LaTeXTranslator):
             return False
         elif 'fragile' in node.attributes['classes']:
             return True
+        elif self.draft:
+            # without highlighted code, only raw LaTeX may need verbatim
+            return bool (self.raw_latex_nodes (node))
+        elif self.has_only_light_code (node):
+            # light formatted code is plain text, and needs no verbatim
+            return False
         else:
             return self.fragile_default
 
+    def raw_latex_nodes (self, node):
+        """
+        Return the raw LaTeX within a node.
+        """
+        return [x for x in node.traverse (nodes.raw)
+            if ('latex' in x.get ('format', '').split())]
+
+    def has_only_light_code (self, node):
+        """
+        Is light formatted code the only verbatim-like content of a node?
+
+        Other literal blocks and raw LaTeX may be verbatim, so their frames
+        are left fragile by default.
+        """
+        if ((self.cb_backend != CB_BACKEND_PYGMENTS) or
+                (self.cb_formatter != CB_FORMATTER_LIGHT) or
+                self.raw_latex_nodes (node)):
+            return False
+        literals = list (node.traverse (nodes.literal_block))
+        return bool (literals) and all ([self.is_highlighted (x)
+            for x in literals])
+
 
     def begin_frametag (self, node):
         bf_str = '\n\\begin{frame}'
         if self.node_fragile_check(node):
             bf_str += '[fragile]'
         bf_str += '\n'
+        self.frame_cnt += 1
+        title = ''
+        if (node.children and isinstance (node[0], nodes.title) and
+                (node[0].astext() != 'blankslide')):
+            title = node[0].astext()
+        self.current_frame = (self.frame_cnt, title)
+        if (self.frame_costs is not None):
+            self.begin_frame_stats (node)
         return bf_str
         
 
     def end_frametag (self):
+        self.current_frame = None
+        if (self.frame_stats is not None):
+            self.end_frame_stats()
         return '\n\\end{frame}\n'
 
+    def begin_frame_stats (self, node):
+        """
+        Start recording the content of a frame, for estimating its cost.
+        """
+        title = ''
+        if node.children and isinstance (node[0], nodes.title):
+            title = node[0].astext()
+        self.frame_stats = {
+            'title': title,
+            'line': first_line_node (node).line,
+            'fragile': self.node_fragile_check (node),
+            'overlay_steps': 0,
+            'notes': 0,
+            'images': [],
+            'code_lines': 0,
+            'minted_blocks': 0,
+            'table_cells': 0,
+        }
+        self.frame_costs.append (self.frame_stats)
+
+    def end_frame_stats (self):
+        """
+        Finish recording a frame, counting the pages it makes.
+        """
+        stats = self.frame_stats
+        # each step of an overlay is a page
+        stats['pages'] = max (stats['overlay_steps'], 1)
+        if (self.notes_mode == SHOWNOTES_FALSE):
+            stats['note_pages'] = 0
+        elif (self.notes_mode == SHOWNOTES_ONLY):
+            stats['note_pages'] = stats['notes'] and stats['pages']
+        else:
+            # on a second screen, every page has notes beside it
+            stats['note_pages'] = stats['pages']
+        self.frame_stats = None
+
+    def report_frame_costs (self, count):
+        """
+        Report the frames estimated to be the most costly to compile.
+
+        :Parameters:
+            count
+                How many frames to report.
+
+        The report is written to the warning stream, most costly first.
+        """
+        ## Preconditions & preparation:
+        image_sizes = {}
+        for stats in self.frame_costs:
+            for uri in stats['images']:
+                if (uri not in image_sizes):
+                    image_sizes[uri] = self.image_megapixels (uri)
+        ## Main:
+        costs = [(estimate_frame_cost (x,
+            sum ([image_sizes[uri] for uri in x['images']])), i, x)
+            for i, x in enumerate (self.frame_costs)]
+        costs.sort (key=lambda x: (-x[0], x[1]))
+        lines = ['Estimated LaTeX cost of the %s most costly of %s frames:' %
+            (min (count, len (costs)), len (costs)),
+            '%8s %5s %6s  %s' % ('cost', 'pages', 'line', 'frame')]
+        for cost, i, stats in costs[:count]:
+            details = []
+            if stats['note_pages']:
+                details.append ('%s notes pages' % stats['note_pages'])
+            if stats['fragile']:
+                details.append ('fragile')
+            if stats['images']:
+                details.append ('%s images' % len (stats['images']))
+            if stats['code_lines']:
+                details.append ('%s code lines' % stats['code_lines'])
+            if stats['table_cells']:
+                details.append ('%s table cells' % stats['table_cells'])
+            lines.append ('%8.1f %5s %6s  %s' % (cost, stats['pages'],
+                stats['line'] or '-', stats['title'] or '#%s' % (i + 1)) +
+                (details and ' (%s)' % ', '.join (details) or ''))
+        ## Postconditions & return:
+        self.document.reporter.stream.write ('\n'.join (lines) + '\n')
+
+    def image_megapixels (self, uri):
+        """
+        Return the size of an image in millions of pixels, or 0 if unknown.
+
+        The image is found relative to the document rather than the working
+        directory, as when recording dependencies.
+        """
+        fpath = find_source_file (self.settings, self.document.get ('source'),
+            uri)
+        try:
+            data = read_bundle_file (self.settings, fpath)
+            if (data is None):
+                infile = open (fpath, 'rb')
+            else:
+                infile = io.BytesIO (data)
+            try:
+                size = image_pixel_size (infile)
+            finally:
+                infile.close()
+        except (IOError, OSError, struct.error):
+            return 0.0
+        if (size is None):
+            return 0.0
+        return size[0] * size[1] / 1e6
+
     def visit_section (self, node):
         ## if node.astext() == 'blankslide':
         ##     #this never gets reached, but I don't know if that is bad
@@ -1150,6 +3442,8 @@ class BeamerTranslator (LaTeXTranslator):
             temp = self.section_level + 1
             if temp > self.frame_level:
                 self.frame_level = temp
+            if (self.split_output and (self.section_level == 0)):
+                self.visit_split_section (node)
         else:
             self.out.append (self.begin_frametag(node))
         ## if node.astext() == 'blankslide':
@@ -1167,6 +3461,51 @@ class BeamerTranslator (LaTeXTranslator):
         LaTeXTranslator.depart_section (self, node)
         if (self.section_level == self.frame_level):#0
             self.out.append (self.end_frametag())
+        if (self.in_split_section and (self.section_level == 0)):
+            self.depart_split_section (node)
+
+    def visit_split_section (self, node):
+        """
+        Start collecting a top-level section for output to its own file.
+        """
+        # name files by id only, so adding or moving a section doesn't
+        # rename (and so rewrite) the files of those after it
+        ids = node.get ('ids') or ['section']
+        fpath = os.path.join (self.split_output, '%s.tex' % ids[0])
+        self.out.append ('\n\\input{%s}\n' %
+            output_relative_path (self.settings, fpath))
+        # the content is only joined when written, after any backpatching
+        section_out = []
+        self.split_files.append ((fpath, section_out))
+        self.push_output_collector (section_out)
+        self.in_split_section = True
+
+    def depart_split_section (self, node):
+        self.pop_output_collector()
+        self.in_split_section = False
+
+    def write_split_files (self):
+        """
+        Write the sections collected for separate output to their files.
+
+        Only files whose content has changed are rewritten, so that
+        downstream tools only see the sections that were edited. Files left
+        from sections that have since been removed or renamed are deleted.
+        """
+        if not os.path.isdir (self.split_output):
+            os.makedirs (self.split_output)
+        for fpath, section_out in self.split_files:
+            text = ''.join (section_out)
+            if self.minimize_output:
+                text = minimize_latex (text)
+            write_if_changed (fpath, text, self.settings.output_encoding,
+                self.settings.output_encoding_error_handler)
+        written = set ([os.path.normpath (x[0]) for x in self.split_files])
+        for fname in os.listdir (self.split_output):
+            fpath = os.path.join (self.split_output, fname)
+            if (fname.endswith ('.tex') and os.path.isfile (fpath) and
+                    (os.path.normpath (fpath) not in written)):
+                os.remove (fpath)
 
 
     def visit_title (self, node):
@@ -1183,6 +3522,12 @@ class BeamerTranslator (LaTeXTranslator):
         ##     #content.  It must at least contain a comment.
         ##     #self.out.append('\\begin{frame}[plain]{}\n\\end{frame}')
         ##     raise nodes.SkipNode
+        elif isinstance (node.parent, nodes.table):
+            # a caption, wherever the table is
+            if (self.simple_table is not None):
+                self.push_output_collector (self.simple_table['caption'])
+            else:
+                LaTeXTranslator.visit_title (self, node)
         elif (self.section_level == self.frame_level+1):#1
             if node.astext() == 'blankslide':
                 title = ''
@@ -1194,30 +3539,204 @@ class BeamerTranslator (LaTeXTranslator):
             LaTeXTranslator.visit_title (self, node)
 
     def depart_title (self, node):
-        if (self.section_level != self.frame_level+1):#1
+        if isinstance (node.parent, nodes.table):
+            if (self.simple_table is not None):
+                self.pop_output_collector()
+            else:
+                LaTeXTranslator.depart_title (self, node)
+        elif (self.section_level != self.frame_level+1):#1
             LaTeXTranslator.depart_title (self, node)
 
+    def visit_continuation_frame (self, node):
+        """
+        End the current frame and start another with the same title.
+
+        Frames can only be broken directly within a slide, so elsewhere (e.g.
+        within a block, columns or notes) this warns and keeps to one frame.
+        """
+        section = node.parent
+        in_frame = ((section.tagname == 'section') and
+            not has_sub_sections (section))
+        if not in_frame or self.in_columnset or self.in_note:
+            self.document.reporter.warning ('A frame can only be continued '
+                'directly within a slide, so the content is kept in one '
+                'frame.', base_node=node)
+        else:
+            title = ''
+            if (section.children and
+                    isinstance (section[0], nodes.title) and
+                    (section[0].astext() != 'blankslide')):
+                title = self.encode (section[0].astext())
+            self.out.append (self.end_frametag())
+            self.out.append (self.begin_frametag (section))
+            self.out.append ('\\frametitle{%s}\n\n' % title)
+        raise nodes.SkipNode
+
+    def depart_continuation_frame (self, node):
+        pass
+
+
+    def visit_table (self, node):
+        """
+        Set simple tables as a tabular, leaving others to the docutils
+        longtable.
+
+        Frames hold only short tables, which don't need the machinery of
+        longtable, and a tabular is quicker to typeset and can be used in
+        frames that aren't fragile.
+        """
+        self.simple_table_stack.append (self.simple_table)
+        if not is_simple_table (node):
+            self.simple_table = None
+            return LaTeXTranslator.visit_table (self, node)
+        style = self.settings.table_style
+        for cls in node['classes']:
+            if (cls in ('standard', 'booktabs', 'borderless', 'nolines')):
+                style = cls
+        if (style == 'booktabs'):
+            self.requirements['booktabs'] = '\\usepackage{booktabs}'
+        self.simple_table = {
+            'style': style,
+            'caption': [],
+            'stubs': [],
+            'in_head': False,
+            'cell_cnt': 0,
+        }
+
+    def depart_table (self, node):
+        if (self.simple_table is None):
+            LaTeXTranslator.depart_table (self, node)
+        elif node.get ('ids'):
+            self.out += self.ids_to_labels (node, set_anchor=False) + ['\n']
+        self.simple_table = self.simple_table_stack.pop()
+
+    def visit_tgroup (self, node):
+        table = self.simple_table
+        if (table is None):
+            return LaTeXTranslator.visit_tgroup (self, node)
+        colspecs = [x for x in node.children if isinstance (x, nodes.colspec)]
+        table['stubs'] = [x.get ('stub') for x in colspecs]
+        bar = ''
+        if (table['style'] == 'standard'):
+            bar = '|'
+        self.out.append ('\n')
+        if table['caption']:
+            self.out.append ('\\begin{table}\n\\caption{%s}\n' %
+                ''.join (table['caption']))
+        self.out.append ('\\begin{tabular}{%s}\n' % tabular_col_specs (
+            [x['colwidth'] for x in colspecs], bar))
+        if (table['style'] == 'standard'):
+            self.out.append ('\\hline\n')
+        elif (table['style'] == 'booktabs'):
+            self.out.append ('\\toprule\n')
+
+    def depart_tgroup (self, node):
+        table = self.simple_table
+        if (table is None):
+            return LaTeXTranslator.depart_tgroup (self, node)
+        if (table['style'] == 'booktabs'):
+            self.out.append ('\\bottomrule\n')
+        self.out.append ('\\end{tabular}\n')
+        if table['caption']:
+            self.out.append ('\\end{table}\n')
+
+    def visit_colspec (self, node):
+        if (self.simple_table is None):
+            return LaTeXTranslator.visit_colspec (self, node)
+        # already used for the tabular
+        raise nodes.SkipNode
+
+    def visit_thead (self, node):
+        if (self.simple_table is None):
+            return LaTeXTranslator.visit_thead (self, node)
+        self.simple_table['in_head'] = True
+
+    def depart_thead (self, node):
+        if (self.simple_table is None):
+            return LaTeXTranslator.depart_thead (self, node)
+        self.simple_table['in_head'] = False
+        if (self.simple_table['style'] == 'booktabs'):
+            self.out.append ('\\midrule\n')
+
+    def visit_tbody (self, node):
+        if (self.simple_table is None):
+            LaTeXTranslator.visit_tbody (self, node)
+
+    def visit_row (self, node):
+        if (self.simple_table is None):
+            return LaTeXTranslator.visit_row (self, node)
+        self.simple_table['cell_cnt'] = 0
+
+    def depart_row (self, node):
+        if (self.simple_table is None):
+            return LaTeXTranslator.depart_row (self, node)
+        self.out.append (' \\\\\n')
+        if (self.simple_table['style'] == 'standard'):
+            self.out.append ('\\hline\n')
+
+    def visit_entry (self, node):
+        if (self.frame_stats is not None):
+            self.frame_stats['table_cells'] += 1
+        table = self.simple_table
+        if (table is None):
+            return LaTeXTranslator.visit_entry (self, node)
+        if table['cell_cnt']:
+            self.out.append (' & ')
+        table['cell_cnt'] += 1
+        stubs = table['stubs']
+        if (table['in_head'] or ((table['cell_cnt'] <= len (stubs)) and
+                stubs[table['cell_cnt'] - 1])):
+            self.out.append ('\\textbf{')
+            self.context.append ('}')
+        else:
+            self.context.append ('')
+
+    def depart_entry (self, node):
+        if (self.simple_table is None):
+            return LaTeXTranslator.depart_entry (self, node)
+        self.out.append (self.context.pop())
 
     def visit_literal_block (self, node):
         # FIX: the purpose of this method is unclear, but it causes parsed
         # literals in docutils 0.6 to lose indenting. Thus we've solve the
         # problem be just getting rid of it. [PMA 20091020]
         # TODO: replace leading tabs like in codeblocks?
-        if (node_has_class (node, 'code-block') and self.cb_use_pygments):
+        if self.is_highlighted (node):
             self.visit_codeblock (node)
+        elif (self.minimize_output):
+            start_posn = len (self.out)
+            LaTeXTranslator.visit_literal_block (self, node)
+            # the quote (not used in tables) and font are set by rtbquote
+            if (self.out[start_posn] == '%\n\\begin{quote}'):
+                self.fallbacks['rtbquote'] = RTBQUOTE_DEF
+                self.out[start_posn] = '\\begin{rtbquote}'
+                self.context[-1] = '\n\\end{rtbquote}\n'
         else:
             self.out.append ('\\setbeamerfont{quote}{parent={}}\n')
             LaTeXTranslator.visit_literal_block (self, node)
 
     def depart_literal_block (self, node):
         # FIX: see `visit_literal_block`
-        if (node_has_class (node, 'code-block') and self.cb_use_pygments):
+        if self.is_highlighted (node):
             self.visit_codeblock (node)
         else:
             LaTeXTranslator.depart_literal_block (self, node)
-            self.out.append ( '\\setbeamerfont{quote}{parent=quotation}\n' )
+            if not self.minimize_output:
+                self.out.append (
+                    '\\setbeamerfont{quote}{parent=quotation}\n')
 
-    def visit_codeblock (self, node):
+    def is_highlighted (self, node):
+        """
+        Is this literal block a codeblock that is to be highlighted?
+        """
+        return (node_has_class (node, 'code-block') and
+            (self.cb_backend != CB_BACKEND_PLAIN) and
+            (node not in self.cb_plain_nodes))
+
+    def codeblock_source (self, node):
+        """
+        Return the language and (tab-adjusted) source code of a codeblock.
+        """
         # was langauge argument defined on node?
         lang =  node.get ('language', None)
         # otherwise, was it defined in node classes?
@@ -1231,14 +3750,142 @@ class BeamerTranslator (LaTeXTranslator):
         if (self.cb_replace_tabs):
             srccode = '\n'.join (adjust_indent_spaces (x,
                 new_width=self.cb_replace_tabs) for x in srccode.split ('\n'))
-        # hilight the code
-        hilite_code = highlight_code (srccode, lang)
-        self.out.append ('\n' + hilite_code + '\n')
+        return lang, srccode
+
+    def highlight_batches (self):
+        """
+        Highlight the codeblocks of the document together, by language.
+
+        :Returns:
+            A dictionary of the LaTeX for each codeblock, keyed by its
+            language and source code.
+
+        Codeblocks whose language is to be guessed are left to be
+        highlighted on their own.
+        """
+        ## Preconditions & preparation:
+        # the sources of each language, in order, and a set of them for
+        # finding repeats
+        by_lang = {}
+        seen = set()
+        for node in self.document.traverse (nodes.literal_block):
+            if self.is_highlighted (node):
+                lang, srccode = self.codeblock_source (node)
+                if (lang != 'guess') and ((lang, srccode) not in seen):
+                    seen.add ((lang, srccode))
+                    by_lang.setdefault (lang, []).append (srccode)
+        ## Main:
+        batched = {}
+        for lang, texts in by_lang.items():
+            hilite_codes = highlight_code_batch (texts, lang,
+                self.cb_formatter, self.cb_token_types)
+            for srccode, hilite_code in zip (texts, hilite_codes):
+                batched[(lang, srccode)] = hilite_code
+        ## Postconditions & return:
+        return batched
+
+    def visit_codeblock (self, node):
+        lang, srccode = self.codeblock_source (node)
+        if (self.frame_stats is not None):
+            self.frame_stats['code_lines'] += srccode.count ('\n') + 1
+            if (self.cb_backend == CB_BACKEND_MINTED):
+                self.frame_stats['minted_blocks'] += 1
+        # leave it to LaTeX to highlight?
+        if (self.cb_backend in (CB_BACKEND_LISTINGS, CB_BACKEND_MINTED)):
+            if (self.cb_backend == CB_BACKEND_LISTINGS):
+                self.requirements['listings'] = LISTINGS_SETUP
+            else:
+                self.requirements['minted'] = '\\usepackage{minted}\n'
+            self.out.append ('\n' + passthrough_code (srccode, lang,
+                self.cb_backend, node.get ('linenos', False)) + '\n')
+            raise nodes.SkipNode
+        # hilight the code, unless it's a repeat that will be replaced
+        key = ('code', lang, self.cb_formatter, srccode)
+        if (self.dedupe and (key in self.dedupe_entries)):
+            self.out.append ('')
+        elif (self.cb_worker is not None):
+            hilite_code = self.cb_worker.highlight (srccode, lang,
+                self.cb_formatter, self.cb_token_types)
+            if (hilite_code is None):
+                self.document.reporter.warning ('Highlighting took longer '
+                    'than %s seconds, so the code is set as plain text.' %
+                    self.cb_worker.timeout, base_node=node)
+                self.cb_plain_nodes.add (node)
+                return self.visit_literal_block (node)
+            self.out.append ('\n' + hilite_code + '\n')
+        else:
+            if (self.cb_batch and (self.cb_batched is None)):
+                self.cb_batched = self.highlight_batches()
+            hilite_code = (self.cb_batched or {}).get ((lang, srccode))
+            if (hilite_code is None):
+                hilite_code = highlight_code (srccode, lang,
+                    self.cb_formatter, self.cb_token_types)
+            self.out.append ('\n' + hilite_code + '\n')
+        if (self.dedupe):
+            if (key in self.dedupe_entries):
+                self.dedupe_output (key)
+            elif (self.cb_formatter == CB_FORMATTER_LIGHT):
+                self.dedupe_output (key, DEDUPE_CODE_MACRO, hilite_code)
+            else:
+                # a boxed Verbatim can be saved in a box
+                box_code = hilite_code.replace ('{Verbatim}', '{BVerbatim}')
+                self.dedupe_output (key, DEDUPE_CODE_BOX, box_code)
         raise nodes.SkipNode
 
     def depart_codeblock (self, node):
         pass
 
+    def dedupe_output (self, key, kind=None, content=None, posn=None):
+        """
+        Record output that may be repeated, and replace any repeats.
+
+        :Parameters:
+            key
+                Identifies identical copies of the output.
+            kind
+                How the output is saved, one of the `DEDUPE_*` constants.
+                Only needed for the first copy.
+            content
+                The LaTeX to be saved, if different to the output.
+            posn
+                The position in the output of the copy, by default the last.
+
+        The first copy is left in place. When a second copy turns up, the
+        content is saved (defined in `depart_document`) and both it and the
+        first are replaced with a reference to the saved copy, as will any
+        further copies.
+        """
+        ## Preconditions & preparation:
+        if (posn is None):
+            posn = len (self.out) - 1
+        ## Main:
+        entry = self.dedupe_entries.get (key)
+        if (entry is None):
+            self.dedupe_entries[key] = {
+                'kind': kind,
+                'content': content or self.out[posn],
+                'name': None,
+                'out': self.out,
+                'posn': posn,
+            }
+            return
+        if (entry['name'] is None):
+            entry['name'] = 'rtbsaved' + alpha_label (len (self.dedupe_saved))
+            self.dedupe_saved.append (entry)
+            entry['out'][entry['posn']] = self.dedupe_reference (entry)
+        self.out[posn] = self.dedupe_reference (entry)
+
+    def dedupe_reference (self, entry):
+        """
+        Return the LaTeX that refers to saved, deduplicated content.
+        """
+        if (entry['kind'] == DEDUPE_CODE_MACRO):
+            return '\n\\%s\n' % entry['name']
+        elif (entry['kind'] == DEDUPE_CODE_BOX):
+            return '\n\\par\\noindent\\usebox{\\%s}\\par\n' % entry['name']
+        else:
+            return '\\usebox{\\%s}' % entry['name']
+
     def visit_bullet_list (self, node):
         # NOTE: required by the loss of 'topic_classes' in docutils 0.6
         # TODO: so what replaces it?
@@ -1251,6 +3898,7 @@ class BeamerTranslator (LaTeXTranslator):
             begin_str = '\\begin{itemize}'
             if self.node_overlay_check(node):
                 begin_str += '[<+-| alert@+>]'
+                self.count_overlay_steps (node)
             begin_str += '\n'
             self.out.append (begin_str)
 
@@ -1259,8 +3907,10 @@ class BeamerTranslator (LaTeXTranslator):
         """Assuming that the bullet or enumerated list is the child of
         a slide, check to see if the slide has either nooverlay or
         overlay in its classes.  If not, default to the commandline
-        specification for overlaybullets."""
-        if 'nooverlay' in node.parent.attributes['classes']:
+        specification for overlaybullets. Drafts have no overlays."""
+        if self.draft:
+            return False
+        elif 'nooverlay' in node.parent.attributes['classes']:
             return False
         elif 'overlay' in node.parent.attributes['classes']:
             return True
@@ -1268,6 +3918,11 @@ class BeamerTranslator (LaTeXTranslator):
             return self.overlay_bullets
 
 
+    def count_overlay_steps (self, node):
+        # each item of an overlay list is revealed in a step of its own
+        if (self.frame_stats is not None):
+            self.frame_stats['overlay_steps'] += len (node.children)
+
     def depart_bullet_list (self, node):
         # NOTE: see `visit_bullet_list`
         if (hasattr (self, 'topic_classes') and
@@ -1295,6 +3950,7 @@ class BeamerTranslator (LaTeXTranslator):
             begin_str = '\\begin{enumerate}'
             if self.node_overlay_check(node):
                 begin_str += '[<+-| alert@+>]'
+                self.count_overlay_steps (node)
             begin_str += '\n'
             self.out.append(begin_str)
             if node.has_key('start'):
@@ -1360,13 +4016,49 @@ class BeamerTranslator (LaTeXTranslator):
 
     def visit_beamer_note (self, node):
         assert not self.in_note, "already in note, which cannot be nested"
+        if (self.notes_file):
+            self.record_note (node)
+        if self.draft:
+            # notes are hidden in a draft, so needn't be typeset
+            raise nodes.SkipNode
         self.in_note = True
+        if (self.frame_stats is not None):
+            self.frame_stats['notes'] += 1
         self.out.append ('\\note{\n')
 
     def depart_beamer_note (self, node):
         self.in_note = False
         self.out.append ('}\n')
 
+    def record_note (self, node):
+        """
+        Record the text of a note, with those of the same frame.
+        """
+        text = node.astext().strip()
+        frame, title = self.current_frame or (None, '')
+        if ((frame is not None) and self.frame_notes and
+                (self.frame_notes[-1]['frame'] == frame)):
+            self.frame_notes[-1]['notes'] += '\n\n' + text
+        else:
+            self.frame_notes.append ({'frame': frame, 'title': title,
+                'notes': text})
+
+    def write_notes_file (self):
+        """
+        Write the notes of each frame to the notes file, if they've changed.
+
+        The file holds JSON (a list of objects with the number, title and
+        notes of a frame) if its name ends in '.json', and otherwise plain
+        text. Notes outside of any frame have no number.
+        """
+        if self.notes_file.lower().endswith ('.json'):
+            text = json.dumps (self.frame_notes, indent=2, sort_keys=True,
+                separators=(',', ': '), ensure_ascii=False)
+        else:
+            text = u'\n\n'.join ([u'%s. %s\n\n%s' % (x['frame'] or '-',
+                x['title'], x['notes']) for x in self.frame_notes])
+        write_if_changed (self.notes_file, text + u'\n', 'utf-8')
+
     def visit_onlybeamer (self, node):
         if node.handouttext:
             self.out.append('\\only<handout>{%s}\n' % node.handouttext)
@@ -1389,17 +4081,14 @@ class BeamerTranslator (LaTeXTranslator):
 
 
     def _get_admonition_class(self, node):
-        # strip the generic 'admonition' from the list of classes
-        filt_classes = [cls for cls in node['classes']
-                           if cls != 'admonition']
+        filt_classes = admonition_classes (node)
         assert len(filt_classes) == 1, "I need exactly 1 classe: " + str(filt_classes)
         myclass = filt_classes[0].lower()#I think docutils lowers anyways, but just to be sure
         return myclass
 
         
     def _get_alertblock_type(self, myclass):
-        alertlist = ['attention', 'caution', 'danger', 'error', 'warning']
-        if myclass in alertlist:
+        if myclass in ALERTBLOCK_CLASSES:
             env = 'alertblock'
         else:
             env = 'block'
@@ -1419,8 +4108,12 @@ class BeamerTranslator (LaTeXTranslator):
     
 
     def depart_admonition(self, node=None):
-        myclass = self._get_admonition_class(node)
-        env = self._get_alertblock_type(myclass)
+        # system messages are departed without their node, but are blocks
+        if node is None:
+            env = 'block'
+        else:
+            myclass = self._get_admonition_class(node)
+            env = self._get_alertblock_type(myclass)
         self.out.append ('\\end{%s}\n' % env)
 
 
@@ -1450,17 +4143,283 @@ class BeamerTranslator (LaTeXTranslator):
             LaTeXTranslator.depart_container (self, node)
 
 
+class StructureChecker (nodes.NodeVisitor):
+    """
+    Reports problems in the structure of a doctree that would stop it being
+    translated to Beamer.
+
+    Each problem is reported as an error, with the source line of the node,
+    and checking carries on so that all are found in one pass. This is much
+    quicker than translating, as no code is highlighted and no LaTeX made.
+    """
+
+    def __init__ (self, document):
+        nodes.NodeVisitor.__init__ (self, document)
+        self.columnset_depth = 0
+        self.column_depth = 0
+        self.note_depth = 0
+        self.problem_cnt = 0
+
+    def report (self, msg, node):
+        self.problem_cnt += 1
+        self.document.reporter.error (msg, base_node=first_line_node (node))
+
+    def unknown_visit (self, node):
+        pass
+
+    def unknown_departure (self, node):
+        pass
+
+    def visit_columnset (self, node):
+        if self.columnset_depth:
+            self.report ('Column sets cannot be nested.', node)
+        self.columnset_depth += 1
+
+    def depart_columnset (self, node):
+        self.columnset_depth -= 1
+
+    def visit_column (self, node):
+        if self.column_depth:
+            self.report ('Columns cannot be nested.', node)
+        elif not self.columnset_depth:
+            self.report ('Columns must be within a column set.', node)
+        self.column_depth += 1
+
+    def depart_column (self, node):
+        self.column_depth -= 1
+
+    def visit_beamer_note (self, node):
+        if self.note_depth:
+            self.report ('Notes cannot be nested.', node)
+        self.note_depth += 1
+
+    def depart_beamer_note (self, node):
+        self.note_depth -= 1
+
+    def visit_container (self, node):
+        # as for translation, which wraps the children of simple columns
+        if (node_has_class (node, 'r2b-simplecolumns')):
+            self.visit_columnset (node)
+            self.column_depth += 1
+        elif (node_has_class (node, 'r2b-note')):
+            self.visit_beamer_note (node)
+
+    def depart_container (self, node):
+        if (node_has_class (node, 'r2b-simplecolumns')):
+            self.column_depth -= 1
+            self.depart_columnset (node)
+        elif (node_has_class (node, 'r2b-note')):
+            self.depart_beamer_note (node)
+
+    def visit_admonition (self, node):
+        classes = admonition_classes (node)
+        if (len (classes) != 1):
+            self.report ('Admonitions need exactly one class, not %s.' %
+                (classes and ', '.join (classes) or 'none'), node)
+
+
 class BeamerWriter (Latex2eWriter):
         """
         A docutils writer that produces Beamer-flavoured LaTeX.
         """
         settings_spec = BEAMER_SPEC
         settings_default_overrides = BEAMER_DEFAULT_OVERRIDES
+        settings_defaults = dict (Latex2eWriter.settings_defaults,
+            **BEAMER_DEFAULTS)
         def __init__(self):
-            self.settings_defaults.update(BEAMER_DEFAULTS)
             Latex2eWriter.__init__(self)
             self.translator_class = BeamerTranslator
 
+        def write (self, document, destination):
+            if document.settings.check_only:
+                # nothing is written, so the destination mustn't even be
+                # opened (which would empty an existing output file)
+                Latex2eWriter.write (self, document,
+                    docutils_io.NullOutput())
+                return self.output
+            return Latex2eWriter.write (self, document, destination)
+
+        def translate (self):
+            settings = self.document.settings
+            if settings.check_only:
+                self.output = self.check_structure()
+                return
+            # the highlighting process is owned here rather than by the
+            # translator, so it's stopped however the translation ends
+            translator_class = self.translator_class
+            cb_worker = None
+            if settings.cb_timeout:
+                cb_worker = HighlightWorker (settings.cb_timeout)
+            self.translator_class = lambda document: translator_class (
+                document, cb_worker)
+            try:
+                Latex2eWriter.translate (self)
+            finally:
+                self.translator_class = translator_class
+                if (cb_worker is not None):
+                    cb_worker.close()
+            if settings.preamble_file:
+                self.output = self.split_preamble (settings.preamble_file)
+            if settings.minimize_output:
+                self.output = minimize_latex (self.output)
+
+        def assemble_parts (self):
+            if self.document.settings.check_only:
+                # there are no parts without a translation
+                return writers.Writer.assemble_parts (self)
+            Latex2eWriter.assemble_parts (self)
+
+        def check_structure (self):
+            """
+            Check the structure of the document, in place of translating it.
+
+            :Returns:
+                The (empty) output.
+
+            Problems are reported as errors, and lower the exit status level
+            so that the commandline exits with an error if any are found.
+            """
+            checker = StructureChecker (self.document)
+            self.document.walkabout (checker)
+            settings = self.document.settings
+            if checker.problem_cnt:
+                settings.exit_status_level = min (
+                    settings.exit_status_level,
+                    self.document.reporter.ERROR_LEVEL)
+            return ''
+
+        def split_preamble (self, preamble_file):
+            """
+            Move the shared part of the preamble to a file of its own.
+
+            :Parameters:
+                preamble_file
+                    The path of the file to write the preamble to.
+
+            :Returns:
+                The output, with the preamble replaced by an ``\\input``.
+
+            The preamble written is everything up to the PDF properties and
+            title data, which are particular to each presentation and so are
+            left in the main document, as are the saved copies of repeated
+            content. As it is fully determined by the settings and the
+            requirements of the document (with all of the Pygments style,
+            not just the tokens used), decks built with the same options
+            share the same preamble. The main document only inputs the
+            preamble if it hasn't been loaded already (i.e. precompiled into
+            a format).
+            """
+            ## Preconditions & preparation:
+            body_posn = self.output.index ('\\begin{document}')
+            split_posn = body_posn
+            if self.parts['pdfsetup']:
+                split_posn = self.output.rfind (self.parts['pdfsetup'], 0,
+                    body_posn)
+            ## Main:
+            preamble = (self.output[:split_posn] +
+                '\n\\def\\rtbpreamble{}\n')
+            settings = self.document.settings
+            if settings.minimize_output:
+                preamble = minimize_latex (preamble)
+            write_if_changed (preamble_file, preamble,
+                settings.output_encoding,
+                settings.output_encoding_error_handler)
+            ## Postconditions & return:
+            return ('\\ifdefined\\rtbpreamble\\else\\input{%s}\\fi\n' %
+                output_relative_path (settings, preamble_file)) + \
+                self.output[split_posn:]
+
+
+### API ###
+
+def convert_string (source, source_path=None, settings_overrides=None):
+    """
+    Convert restructured text to Beamer-flavoured LaTeX.
+
+    :Parameters:
+        source
+            The ReST to convert, as a string.
+        source_path
+            The path the source came from, if any, against which included
+            files and images are found.
+        settings_overrides
+            A dictionary of settings (as named in the option destinations,
+            e.g. 'cb_use_pygments') to use in place of the defaults.
+
+    :Returns:
+        The encoded LaTeX output.
+
+    Unlike the commandline, errors are raised as exceptions rather than
+    exiting. Conversions share no state, so may be run concurrently in
+    threads.
+    """
+    overrides = {'traceback': True}
+    overrides.update (settings_overrides or {})
+    return publish_string (source=source, source_path=source_path,
+        parser=BeamerParser(), writer=BeamerWriter(),
+        settings_overrides=overrides)
+
+
+def convert_file (source_path, settings_overrides=None):
+    """
+    Convert a file of restructured text to Beamer-flavoured LaTeX.
+
+    :Parameters:
+        source_path
+            The path of the ReST file.
+        settings_overrides
+            A dictionary of settings to use in place of the defaults.
+
+    :Returns:
+        The encoded LaTeX output.
+
+    """
+    infile = open (source_path, 'rb')
+    try:
+        source = infile.read()
+    finally:
+        infile.close()
+    return convert_string (source, source_path, settings_overrides)
+
+
+def convert_bundle (files, source_path, settings_overrides=None):
+    """
+    Convert a presentation and the files it uses, all held in memory.
+
+    :Parameters:
+        files
+            A mapping of paths to file contents (as bytes), holding the
+            presentation and any files included by it.
+        source_path
+            The path of the presentation in `files`.
+        settings_overrides
+            A dictionary of settings to use in place of the defaults.
+
+    :Returns:
+        The encoded LaTeX output.
+
+    Included files (by the 'include', 'literalinclude' and 'r2b-csv-table'
+    directives) are looked up in `files`, relative to the file including
+    them, and a missing file is an error. Images are looked up relative to
+    the presentation, and a warning given for any missing from `files`.
+    Nothing is read from or written to disk, including configuration files,
+    so settings that write files (e.g. 'preamble_file') can't be used.
+    """
+    ## Preconditions & preparation:
+    overrides = dict (settings_overrides or {})
+    for name in ['preamble_file', 'split_output', 'notes_file']:
+        if overrides.get (name):
+            raise ValueError ('setting "%s" writes files, so cannot be used '
+                'on a bundle' % name)
+    bundle = dict ([(os.path.normpath (k), v) for k, v in files.items()])
+    source_path = os.path.normpath (source_path)
+    if (source_path not in bundle):
+        raise ValueError ('source "%s" is not in the bundle' % source_path)
+    overrides['_source_bundle'] = bundle
+    overrides['_disable_config'] = True
+    ## Main & return:
+    return convert_string (bundle[source_path], source_path, overrides)
+
 
 ### TEST & DEBUG ###
 # TODO: should really move to a test file or dir
@@ -1473,7 +4432,8 @@ def test_with_file (fpath, args=[]):
     within Python. This is a convenience function that wraps the docutils
     functions to do so.
     """
-    return publish_cmdline (writer=BeamerWriter(), argv=args+[fpath])
+    return publish_cmdline (parser=BeamerParser(), writer=BeamerWriter(),
+        argv=args+[fpath])
 
 
 ### MAIN ###
@@ -1482,7 +4442,8 @@ def main ():
     description = (
         "Generates Beamer-flavoured LaTeX for PDF-based presentations." +
          default_description)
-    publish_cmdline (writer=BeamerWriter(), description=description)
+    publish_cmdline (parser=BeamerParser(), writer=BeamerWriter(),
+        description=description)
 
 
 if __name__ == '__main__':
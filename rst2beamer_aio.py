@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+An asyncio interface for converting restructured text to Beamer LaTeX.
+
+Conversion by docutils is CPU-bound and can take seconds for a large
+presentation, so calling rst2beamer directly from a coroutine blocks the event
+loop. Here conversions are instead run in a pool of worker processes (or
+threads), with a limit on how many run at once, per-conversion timeouts and
+cancellation::
+
+        async with Converter (concurrency=4, timeout=60) as conv:
+            tex = await conv.convert (rst_text)
+            async for path, tex in conv.convert_many (paths):
+                ...
+
+Unlike rst2beamer itself, this module requires Python 3.7 or later.
+
+"""
+
+__docformat__ = 'restructuredtext en'
+
+
+### IMPORTS ###
+
+import asyncio
+import concurrent.futures
+import os
+
+import rst2beamer
+
+
+### IMPLEMENTATION ###
+
+def convert_in_worker (source, source_path, settings_overrides):
+    """
+    Convert a presentation, from text if given or else from its file.
+
+    This is what runs in a worker, so must be picklable (i.e. module level).
+    """
+    if (source is None):
+        return rst2beamer.convert_file (source_path, settings_overrides)
+    return rst2beamer.convert_string (source, source_path, settings_overrides)
+
+
+class Converter (object):
+    """
+    Runs conversions in an executor, without blocking the event loop.
+
+    :Parameters:
+        concurrency
+            The most conversions to run at once. Defaults to the number of
+            CPUs.
+        use_threads
+            Run conversions in threads rather than processes. Threads avoid
+            the cost of starting processes and pickling results, but share
+            the interpreter lock, so suit small or I/O-bound conversions.
+        timeout
+            The default time in seconds to allow each conversion, or None for
+            no limit.
+
+    Timed-out or cancelled conversions stop being waited for, and those not
+    yet started are dropped, but a worker can't be interrupted: one already
+    converting will finish and its result be discarded. The number of
+    workers still bounds how many conversions are actually running.
+    """
+
+    def __init__ (self, concurrency=None, use_threads=False, timeout=None):
+        self.concurrency = concurrency or os.cpu_count() or 1
+        self.use_threads = use_threads
+        self.timeout = timeout
+        self._executor = None
+        self._semaphore = None
+
+    async def __aenter__ (self):
+        return self
+
+    async def __aexit__ (self, exc_type, exc_value, traceback):
+        await self.aclose()
+
+    async def aclose (self):
+        """
+        Shut down the workers, waiting for them without blocking the loop.
+        """
+        # the wait is in a thread. (Not waiting leaves the pool's management
+        # thread to hang the interpreter at exit on some Python versions.)
+        await asyncio.get_running_loop().run_in_executor (None, self.close)
+
+    def close (self, wait=True):
+        """
+        Shut down the workers, blocking until they exit if `wait`.
+        """
+        if self._executor is not None:
+            self._executor.shutdown (wait=wait)
+            self._executor = None
+
+    def _get_executor (self):
+        # started on first use, so a converter can be made outside a loop
+        if self._executor is None:
+            if self.use_threads:
+                pool_cls = concurrent.futures.ThreadPoolExecutor
+            else:
+                pool_cls = concurrent.futures.ProcessPoolExecutor
+            self._executor = pool_cls (max_workers=self.concurrency)
+        return self._executor
+
+    async def convert (self, source=None, source_path=None,
+            settings_overrides=None, timeout=None):
+        """
+        Convert a presentation to Beamer LaTeX.
+
+        :Parameters:
+            source
+                The ReST to convert. If None, the file at `source_path` is
+                read (in the worker).
+            source_path
+                The path the source came from, against which included files
+                and images are found.
+            settings_overrides
+                A dictionary of settings to use in place of the defaults.
+            timeout
+                The time in seconds to allow, overriding the default.
+
+        :Returns:
+            The encoded LaTeX output.
+
+        Raises `asyncio.TimeoutError` if the conversion takes too long.
+        """
+        ## Preconditions & preparation:
+        assert (source is not None) or (source_path is not None), \
+            "need either source text or a path"
+        if (timeout is None):
+            timeout = self.timeout
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore (self.concurrency)
+        ## Main:
+        loop = asyncio.get_running_loop()
+        async with self._semaphore:
+            future = loop.run_in_executor (self._get_executor(),
+                convert_in_worker, source, source_path, settings_overrides)
+            return await asyncio.wait_for (future, timeout)
+
+    async def convert_many (self, source_paths, settings_overrides=None,
+            timeout=None, return_exceptions=False):
+        """
+        Convert a batch of presentations, yielding results as they complete.
+
+        :Parameters:
+            source_paths
+                The paths of the ReST files to convert.
+            settings_overrides
+                A dictionary of settings to use for all the presentations.
+            timeout
+                The time in seconds to allow each conversion.
+            return_exceptions
+                Yield the exceptions of failed conversions as their results,
+                rather than raising them.
+
+        :Returns:
+            An asynchronous iterator over (source path, output) pairs, in
+            order of completion.
+
+        If the iteration is abandoned (or an exception raised), outstanding
+        conversions are cancelled.
+        """
+        async def convert_one (source_path):
+            try:
+                output = await self.convert (source_path=source_path,
+                    settings_overrides=settings_overrides, timeout=timeout)
+            except Exception as err:
+                if not return_exceptions:
+                    raise
+                output = err
+            return source_path, output
+
+        tasks = [asyncio.ensure_future (convert_one (x)) for x in source_paths]
+        try:
+            for next_done in asyncio.as_completed (tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+async def convert (source=None, source_path=None, settings_overrides=None,
+        timeout=None):
+    """
+    Convert a presentation to Beamer LaTeX in a worker process.
+
+    A convenience for one-off conversions, taking the same arguments as
+    `Converter.convert`. Use a `Converter` to share workers between
+    conversions and bound how many run at once.
+    """
+    conv = Converter (concurrency=1)
+    try:
+        return await conv.convert (source, source_path, settings_overrides,
+            timeout)
+    finally:
+        await conv.aclose()
+
+
+### END ###
@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+A writer for quick HTML previews of rst2beamer presentations.
+
+Typesetting a large presentation with pdflatex can take tens of seconds,
+which is slow for checking the layout while writing it. This writer instead
+produces a single HTML page, with an element for each frame, that shows the
+structure of the slides: frame titles, columns, notes, blocks, admonitions
+and the content of ``onlybeamer``. The document is parsed with the rst2beamer
+parser, so the same directives can be used, and frames are found as they are
+for Beamer (i.e. sections without subsections)::
+
+        rst2beamer-html talk.rst talk.html
+
+It's not a replacement for the Beamer output: overlays, themes and
+highlighting are not shown, and the text isn't sized or broken as LaTeX will.
+
+"""
+
+__docformat__ = 'restructuredtext en'
+
+
+### IMPORTS ###
+
+from docutils import nodes
+from docutils.core import publish_cmdline, publish_string, default_description
+from docutils.writers import html4css1
+
+import rst2beamer
+
+
+## CONSTANTS & DEFINES ###
+
+# the rst2beamer options that also apply to previews, by destination
+PREVIEW_OPTIONS = ['preview_frame', 'preview_line']
+
+HTML_PREVIEW_SPEC = (
+    'Beamer preview options',
+    None,
+    tuple ([x for x in rst2beamer.BEAMER_SPEC[2]
+        if x[2].get ('dest') in PREVIEW_OPTIONS]),
+)
+
+# frames are laid out at about the proportions of a 4:3 slide
+PREVIEW_CSS = """
+div.frame { width: 40em; min-height: 30em; margin: 1.5em auto;
+  padding: 0 1.5em 1em; border: 1px solid #888; overflow: hidden;
+  box-shadow: 2px 2px 6px #aaa; }
+div.frame.continued { border-top-style: dashed; }
+div.frame > h1, div.frame > h2, div.frame > h3, div.frame > h4,
+div.frame > h5, div.frame > h6 { margin: 0 -1.5em 0.5em; padding: 0.3em 1.5em;
+  background: #335; color: #fff; font-size: 1.3em; }
+div.section > h1, div.section > h2 { text-align: center; }
+div.columns { display: flex; justify-content: space-between; }
+div.column { box-sizing: border-box; padding: 0 0.5em; }
+div.r2b-note { margin: 0.5em 0; padding: 0.3em 0.8em; border: 1px dashed #c90;
+  background: #ffe; font-size: smaller; }
+div.r2b-note:before { content: "Note"; font-weight: bold; }
+div.block, div.alertblock { margin: 0.5em 0; border: 1px solid #99b;
+  background: #eef; padding: 0 0.8em 0.3em; }
+div.alertblock { border-color: #c66; background: #fee; }
+div.block > p.block-title, div.block > p.admonition-title,
+div.alertblock > p.admonition-title { margin: 0 -0.8em 0.3em;
+  padding: 0.2em 0.8em; background: #99b; color: #fff; font-weight: bold; }
+div.alertblock > p.admonition-title { background: #c66; }
+div.onlybeamer { outline: 1px dotted #99c; }
+"""
+
+
+### IMPLEMENTATION ###
+
+class HtmlPreviewTranslator (html4css1.HTMLTranslator):
+    """
+    Translates a presentation to HTML, showing each frame as a box.
+    """
+
+    def __init__ (self, document):
+        html4css1.HTMLTranslator.__init__ (self, document)
+        self.stylesheet.append ('<style type="text/css">%s</style>\n' %
+            PREVIEW_CSS)
+
+    def visit_section (self, node):
+        # as for Beamer, sections without subsections are frames
+        self.section_level += 1
+        classes = 'section'
+        if not rst2beamer.has_sub_sections (node):
+            classes += ' frame'
+        self.body.append (self.starttag (node, 'div', CLASS=classes))
+
+    def visit_title (self, node):
+        # a blank slide has no title
+        if (node.astext() == 'blankslide'):
+            raise nodes.SkipNode
+        html4css1.HTMLTranslator.visit_title (self, node)
+
+    def visit_continuation_frame (self, node):
+        # only directly within a frame, so the frame can be closed
+        section = node.parent
+        if ((section.tagname == 'section') and
+                not rst2beamer.has_sub_sections (section)):
+            title = ''
+            if (section.children and isinstance (section[0], nodes.title) and
+                    (section[0].astext() != 'blankslide')):
+                title = self.encode (section[0].astext())
+            heading = min (self.section_level +
+                self.initial_header_level - 1, 6)
+            self.body.append ('</div>\n<div class="section frame continued">'
+                '\n<h%s>%s</h%s>\n' % (heading, title, heading))
+        raise nodes.SkipNode
+
+    def visit_columnset (self, node):
+        self.body.append (self.starttag (node, 'div', CLASS='columns'))
+
+    def depart_columnset (self, node):
+        self.body.append ('</div>\n')
+
+    def visit_column (self, node):
+        attrs = {}
+        if getattr (node, 'width', None):
+            attrs['style'] = 'width: %.0f%%' % (node.width * 100)
+        self.body.append (self.starttag (node, 'div', CLASS='column',
+            **attrs))
+
+    def depart_column (self, node):
+        self.body.append ('</div>\n')
+
+    def visit_beamer_note (self, node):
+        self.body.append (self.starttag (node, 'div', CLASS='r2b-note'))
+
+    def depart_beamer_note (self, node):
+        self.body.append ('</div>\n')
+
+    def visit_onlybeamer (self, node):
+        self.body.append (self.starttag (node, 'div', CLASS='onlybeamer'))
+
+    def depart_onlybeamer (self, node):
+        self.body.append ('</div>\n')
+
+    def visit_block (self, node):
+        self.body.append (self.starttag (node, 'div', CLASS='block'))
+        self.body.append ('<p class="block-title">%s</p>\n' %
+            self.encode (getattr (node, 'title', '')))
+
+    def depart_block (self, node):
+        self.body.append ('</div>\n')
+
+    def visit_admonition (self, node):
+        # shown as the block Beamer sets it in
+        classes = rst2beamer.admonition_classes (node)
+        if (len (classes) == 1) and \
+                (classes[0].lower() in rst2beamer.ALERTBLOCK_CLASSES):
+            node['classes'].append ('alertblock')
+        else:
+            node['classes'].append ('block')
+        html4css1.HTMLTranslator.visit_admonition (self, node)
+
+    def visit_container (self, node):
+        if rst2beamer.node_has_class (node, 'r2b-simplecolumns'):
+            rst2beamer.wrap_children_in_columns (node, node.children)
+            self.visit_columnset (node)
+        elif rst2beamer.node_has_class (node, 'r2b-note'):
+            self.visit_beamer_note (node)
+        else:
+            html4css1.HTMLTranslator.visit_container (self, node)
+
+
+class HtmlPreviewWriter (html4css1.Writer):
+    """
+    A docutils writer that produces an HTML preview of a presentation.
+    """
+    settings_spec = html4css1.Writer.settings_spec + HTML_PREVIEW_SPEC
+
+    def __init__ (self):
+        html4css1.Writer.__init__ (self)
+        self.translator_class = HtmlPreviewTranslator
+
+
+### API ###
+
+def convert_string (source, source_path=None, settings_overrides=None):
+    """
+    Convert restructured text to an HTML preview.
+
+    Takes the same arguments as `rst2beamer.convert_string`, and returns the
+    encoded HTML.
+    """
+    overrides = {'traceback': True}
+    overrides.update (settings_overrides or {})
+    return publish_string (source=source, source_path=source_path,
+        parser=rst2beamer.BeamerParser(), writer=HtmlPreviewWriter(),
+        settings_overrides=overrides)
+
+
+### MAIN ###
+
+def main ():
+    description = (
+        "Generates an HTML preview of a Beamer presentation." +
+         default_description)
+    publish_cmdline (parser=rst2beamer.BeamerParser(),
+        writer=HtmlPreviewWriter(), description=description)
+
+
+if __name__ == '__main__':
+    main()
+
+
+### END ###
@@ -0,0 +1,688 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Incremental builds of a project of many rst2beamer presentations.
+
+Presentations often include shared fragments (title pages, reused slides) and
+images. After a change, only the presentations that depend on a changed file
+need converting again. This keeps an index of each presentation's output,
+the files it read (found as for ``--record-dependencies``) and a hash of their
+content, and converts only the presentations that are new or whose files
+have changed::
+
+        rst2beamer-project --outdir build talks/*.rst
+
+Files are compared by content, so touching a file without changing it
+doesn't cause a rebuild, and a fragment shared by many presentations is only
+hashed once per build. Settings are read from the docutils configuration
+files as usual, and these count as files of every presentation. Settings can
+also be given on the commandline, and changing them rebuilds everything::
+
+        rst2beamer-project --setting cb_use_pygments=true talks/*.rst
+
+A build can also be split across several machines. Each converts one shard
+of the presentations and writes a report, and the reports are then merged,
+checking that every presentation was built exactly once::
+
+        rst2beamer-project --shard 2/4 --costs last.json --report 2.json ...
+        rst2beamer-project --merge all.json 1.json 2.json 3.json 4.json
+
+Presentations are assigned to shards so that each has about the same
+conversion time, taken from the merged report of an earlier build or else
+estimated from the size of the source. Given the same sources and report,
+every machine makes the same assignment.
+
+"""
+
+__docformat__ = 'restructuredtext en'
+
+
+### IMPORTS ###
+
+import json
+import os
+import re
+import sys
+import time
+from optparse import OptionParser, OptionValueError
+
+from docutils import io
+from docutils.core import publish_programmatically
+from docutils.frontend import OptionParser as DocutilsOptionParser
+from docutils.readers.standalone import Reader as StandaloneReader
+
+import rst2beamer
+
+
+## CONSTANTS & DEFINES ###
+
+DEFAULT_INDEX = '.rst2beamer-index.json'
+
+# increased when the layout of the index or reports changes
+INDEX_FORMAT = 1
+
+# the outcomes for a presentation in a build report
+STATUS_BUILT = 'built'
+STATUS_CURRENT = 'current'
+STATUS_OUTDATED = 'outdated'
+STATUS_FAILED = 'failed'
+
+# the values of flags given with --setting
+BOOLEAN_VALUES = {
+    '1': True, 'on': True, 'yes': True, 'true': True,
+    '0': False, 'off': False, 'no': False, 'false': False,
+}
+
+
+### IMPLEMENTATION ###
+
+def config_files ():
+    """
+    Return the paths of the docutils configuration files that are read.
+
+    Missing files are included, so that creating one is noticed.
+    """
+    return DocutilsOptionParser().get_standard_config_files()
+
+
+def settings_parser ():
+    """
+    Return a parser of the rst2beamer commandline options.
+    """
+    return DocutilsOptionParser (components=(StandaloneReader,
+        rst2beamer.BeamerParser, rst2beamer.BeamerWriter))
+
+
+def parse_setting (spec, parser):
+    """
+    Parse a setting given on the commandline as 'name=value'.
+
+    :Parameters:
+        spec
+            The setting. It's named as in `rst2beamer.convert_string` (i.e.
+            after the destination of its option, as 'cb_use_pygments') and
+            the value is as given to the option, or a boolean such as 'true'
+            or 'no' for a flag.
+        parser
+            The parser of the rst2beamer options, from `settings_parser`.
+
+    :Returns:
+        The name and value of the setting.
+
+    Raises a ValueError if the setting is unknown or its value invalid.
+    """
+    ## Preconditions & preparation:
+    name, sep, value = spec.partition ('=')
+    name = name.strip().replace ('-', '_')
+    if not (sep and name):
+        raise ValueError ("setting must be given as 'name=value', not '%s'" %
+            spec)
+    options = [x for x in parser._get_all_options() if (x.dest == name)]
+    if not options:
+        raise ValueError ("unknown setting '%s'" % name)
+    ## Main:
+    value_options = [x for x in options if x.takes_value()]
+    if not value_options:
+        try:
+            return name, BOOLEAN_VALUES[value.strip().lower()]
+        except KeyError:
+            raise ValueError ("setting '%s' must be true or false, not '%s'" %
+                (name, value))
+    # converted and checked as the option would be
+    option = value_options[0]
+    values = parser.get_default_values()
+    try:
+        option.process (option.get_opt_string(), value, values, parser)
+    except OptionValueError as err:
+        raise ValueError (str (err))
+    ## Postconditions & return:
+    return name, getattr (values, name)
+
+
+def index_name (fpath, root):
+    """
+    Return the name of a file in an index, relative to the index's directory.
+    """
+    return os.path.relpath (os.path.abspath (fpath), root).replace (os.sep,
+        '/')
+
+
+class BuildIndex (object):
+    """
+    The record of what each presentation in a project was built from.
+
+    :Parameters:
+        fpath
+            The path of the index file. Paths within it are relative to its
+            directory, so a project can be moved or checked out elsewhere.
+        settings_key
+            A string identifying the settings of the build. If it differs
+            from that of the last build, every presentation is outdated.
+
+    The index holds, for each presentation, its output and the hash of each
+    file it read. The size, modification time and hash of every file is also
+    kept, so unchanged files needn't be read again.
+    """
+
+    def __init__ (self, fpath, settings_key=''):
+        self.fpath = fpath
+        self.root = os.path.dirname (os.path.abspath (fpath))
+        self.settings_key = settings_key
+        self.decks = {}
+        self.stats = {}
+        self.digests = {}
+        if os.path.exists (fpath):
+            infile = open (fpath, 'rb')
+            try:
+                data = json.loads (infile.read().decode ('utf-8'))
+            finally:
+                infile.close()
+            if ((data.get ('format') == INDEX_FORMAT) and
+                    (data.get ('version') == rst2beamer.__version__) and
+                    (data.get ('settings') == settings_key)):
+                self.decks = data['decks']
+                self.stats = data['stats']
+
+    def key (self, fpath):
+        """
+        Return the name of a file in the index.
+        """
+        return index_name (fpath, self.root)
+
+    def path (self, key):
+        """
+        Return the path of a file from its name in the index.
+        """
+        return os.path.join (self.root, key.replace ('/', os.sep))
+
+    def file_digest (self, key):
+        """
+        Return the hash of the content of a file, or None if it's missing.
+        """
+        if key not in self.digests:
+            fpath = self.path (key)
+            try:
+                stat = os.stat (fpath)
+            except OSError:
+                self.digests[key] = None
+                return None
+            old_stat = self.stats.get (key)
+            if old_stat and (old_stat[:2] == [stat.st_mtime, stat.st_size]):
+                digest = old_stat[2]
+            else:
+                infile = open (fpath, 'rb')
+                try:
+                    digest = rst2beamer.file_digest (infile.read())
+                finally:
+                    infile.close()
+            self.stats[key] = [stat.st_mtime, stat.st_size, digest]
+            self.digests[key] = digest
+        return self.digests[key]
+
+    def is_outdated (self, source_path, output_path):
+        """
+        Does a presentation need converting again?
+
+        It does if it hasn't been built before, its output is elsewhere or
+        missing, or any of the files it read have changed.
+        """
+        entry = self.decks.get (self.key (source_path))
+        if (entry is None) or (entry['output'] != self.key (output_path)):
+            return True
+        if not os.path.exists (output_path):
+            return True
+        for key, digest in entry['files'].items():
+            if (self.file_digest (key) != digest):
+                return True
+        return False
+
+    def record (self, source_path, output_path, dependencies):
+        """
+        Record the files a presentation was built from.
+        """
+        keys = [self.key (x) for x in [source_path] + list (dependencies)]
+        self.decks[self.key (source_path)] = {
+            'output': self.key (output_path),
+            'files': dict ([(x, self.file_digest (x)) for x in keys]),
+        }
+
+    def forget (self, source_path):
+        """
+        Drop a presentation from the index, so it's built next time.
+        """
+        self.decks.pop (self.key (source_path), None)
+
+    def save (self):
+        """
+        Write the index, if it has changed.
+        """
+        # only keep the details of files some presentation still reads
+        used = set()
+        for entry in self.decks.values():
+            used.update (entry['files'])
+        data = {
+            'format': INDEX_FORMAT,
+            'version': rst2beamer.__version__,
+            'settings': self.settings_key,
+            'decks': self.decks,
+            'stats': dict ([(k, v) for k, v in self.stats.items()
+                if k in used]),
+        }
+        rst2beamer.write_if_changed (self.fpath, json.dumps (data, indent=1,
+            sort_keys=True, separators=(',', ': ')) + '\n', 'utf-8')
+
+
+def parse_shard (spec):
+    """
+    Parse a shard given as 'i/N', the i-th of N (counting from 1).
+
+    :Returns:
+        The shard number and the number of shards.
+
+    Raises a ValueError if the spec is malformed or out of range.
+    """
+    match = re.match (r'^\s*(\d+)\s*/\s*(\d+)\s*$', spec)
+    if not match:
+        raise ValueError ("shard must be given as 'i/N', not '%s'" % spec)
+    num, total = int (match.group (1)), int (match.group (2))
+    if not (1 <= num <= total):
+        raise ValueError ("shard %s is not between 1 and %s" % (num, total))
+    return num, total
+
+
+def assign_shards (costs, total):
+    """
+    Divide presentations between shards, balancing their costs.
+
+    :Parameters:
+        costs
+            A dictionary of the cost of converting each presentation,
+            keyed by its name in the index.
+        total
+            The number of shards.
+
+    :Returns:
+        A dictionary of the shard (counting from 1) of each presentation.
+
+    The costliest presentations are assigned first, each to the shard with
+    the least cost so far. Ties are broken by name and shard number, so the
+    assignment only depends on the costs.
+    """
+    loads = [0.0] * total
+    shards = {}
+    for key in sorted (costs, key=lambda k: (-costs[k], k)):
+        posn = loads.index (min (loads))
+        loads[posn] += costs[key]
+        shards[key] = posn + 1
+    return shards
+
+
+def estimate_costs (keys, index, history=None):
+    """
+    Return the expected cost of converting each presentation.
+
+    :Parameters:
+        keys
+            The names in the index of the presentations.
+        index
+            The build index, for finding the presentations.
+        history
+            A build report of an earlier build, from which the conversion
+            times of presentations are taken.
+
+    :Returns:
+        A dictionary of the cost of each presentation, in seconds if there
+        is any history.
+
+    Presentations without a time are estimated from the size of their
+    source, at the average time per byte of those with one. Sizes are used
+    rather than anything in the (per machine) index, so every machine
+    makes the same estimate.
+    """
+    ## Preconditions & preparation:
+    sizes = {}
+    for key in keys:
+        try:
+            sizes[key] = os.path.getsize (index.path (key))
+        except OSError:
+            sizes[key] = 0
+    times = {}
+    for key, result in (history or {}).get ('results', {}).items():
+        if (key in sizes) and result.get ('seconds'):
+            times[key] = result['seconds']
+    ## Main:
+    rate = 1.0
+    timed_size = sum ([sizes[k] for k in times])
+    if timed_size:
+        rate = sum (times.values()) / timed_size
+    ## Postconditions & return:
+    return dict ([(k, times.get (k, sizes[k] * rate)) for k in keys])
+
+
+def read_report (fpath):
+    """
+    Read a build report, written by `write_report`.
+    """
+    infile = open (fpath, 'rb')
+    try:
+        return json.loads (infile.read().decode ('utf-8'))
+    finally:
+        infile.close()
+
+
+def write_report (fpath, decks, results, shard=None):
+    """
+    Write a build report.
+
+    :Parameters:
+        fpath
+            The path of the report.
+        decks
+            The names of all the presentations in the project.
+        results
+            The status and conversion time of the presentations built, as
+            filled in by `build_project`.
+        shard
+            The shard number and count of the build, if it was sharded.
+
+    """
+    data = {
+        'format': INDEX_FORMAT,
+        'shard': shard and list (shard),
+        'decks': sorted (decks),
+        'results': results,
+    }
+    rst2beamer.write_if_changed (fpath, json.dumps (data, indent=1,
+        sort_keys=True, separators=(',', ': ')) + '\n', 'utf-8')
+
+
+def merge_reports (reports):
+    """
+    Combine the reports of the shards of a build.
+
+    :Parameters:
+        reports
+            The reports, as read by `read_report`.
+
+    :Returns:
+        The report of the whole build, and a list of descriptions of any
+        problems found: reports of different projects or shardings, shards
+        missing or repeated, and presentations that were built by more than
+        one shard, by none or failed.
+
+    """
+    ## Preconditions & preparation:
+    problems = []
+    decks = reports[0]['decks']
+    shards = [x['shard'] for x in reports]
+    total = (shards[0] or [1, 1])[1]
+    ## Main:
+    if [x for x in reports[1:] if (x['decks'] != decks)]:
+        problems.append ('The reports are of different projects.')
+    if [x for x in shards if (x or [1, 1])[1] != total]:
+        problems.append ('The reports are of different numbers of shards.')
+    else:
+        nums = [(x or [1, 1])[0] for x in shards]
+        for num in range (1, total + 1):
+            if (nums.count (num) != 1):
+                problems.append ('Shard %s of %s has %s reports.' %
+                    (num, total, nums.count (num)))
+    results = {}
+    builders = {}
+    for report in reports:
+        for key, result in report['results'].items():
+            results[key] = result
+            builders.setdefault (key, []).append (report['shard'])
+    for key in decks:
+        cnt = len (builders.get (key, []))
+        if (cnt != 1):
+            problems.append ('%s was built by %s shards, not 1.' % (key, cnt))
+        elif (results[key]['status'] == STATUS_FAILED):
+            problems.append ('%s failed to build.' % key)
+    for key in sorted (set (results) - set (decks)):
+        problems.append ('%s is not in the project.' % key)
+    ## Postconditions & return:
+    merged = {'format': INDEX_FORMAT, 'shard': None, 'decks': decks,
+        'results': results}
+    return merged, problems
+
+
+def output_path_for (source_path, outdir=None, root=None):
+    """
+    Return the path of the LaTeX output for a presentation.
+
+    If no output directory is given, the output is beside the source.
+    Otherwise it's at the same place under the output directory as the
+    source is under the root (by default, the working directory).
+    """
+    base = os.path.splitext (source_path)[0] + '.tex'
+    if (outdir is None):
+        return base
+    return os.path.join (outdir, os.path.relpath (os.path.abspath (base),
+        os.path.abspath (root or os.curdir)))
+
+
+def build_deck (source_path, output_path, settings_overrides=None):
+    """
+    Convert a presentation, returning the paths of the files it read.
+    """
+    # as `rst2beamer.convert_file`, but keeping the publisher, as the
+    # settings it records dependencies in are a copy of those given. The
+    # output path is given so that files the output inputs (a preamble or
+    # split sections) are referred to relative to it.
+    overrides = {'traceback': True}
+    overrides.update (settings_overrides or {})
+    output, publisher = publish_programmatically (
+        source_class=io.FileInput, source=None, source_path=source_path,
+        destination_class=io.StringOutput, destination=None,
+        destination_path=output_path, reader=None, reader_name='standalone',
+        parser=rst2beamer.BeamerParser(), parser_name=None,
+        writer=rst2beamer.BeamerWriter(), writer_name=None, settings=None,
+        settings_spec=None, settings_overrides=overrides,
+        config_section=None, enable_exit_status=False)
+    out_dir = os.path.dirname (output_path)
+    if out_dir and not os.path.isdir (out_dir):
+        os.makedirs (out_dir)
+    outfile = open (output_path, 'wb')
+    try:
+        outfile.write (output)
+    finally:
+        outfile.close()
+    return publisher.settings.record_dependencies.list
+
+
+def build_project (source_paths, outdir=None, index_path=DEFAULT_INDEX,
+        settings_overrides=None, force=False, dry_run=False, report=None,
+        shard=None, history=None, results=None):
+    """
+    Convert the presentations of a project that are out of date.
+
+    :Parameters:
+        source_paths
+            The paths of the ReST files of the presentations.
+        outdir
+            The directory for the LaTeX output, laid out as the sources are
+            under the directory of the index. By default, each output is
+            beside its source.
+        index_path
+            The path of the build index.
+        settings_overrides
+            A dictionary of settings to use in place of the defaults. If
+            these change between builds, all presentations are converted.
+        force
+            Convert all the presentations, whether outdated or not.
+        dry_run
+            Only find the outdated presentations, without converting them.
+        report
+            If given, called with each presentation's path and the error
+            (or None) after converting it.
+        shard
+            If given, only build this shard of the presentations, as the
+            shard number and the number of shards.
+        history
+            The merged report of an earlier build, for balancing shards by
+            the time presentations took to convert (see `estimate_costs`).
+        results
+            If given, a dictionary that is filled with the status and
+            conversion time of each presentation in the shard, keyed by its
+            name in the index. This is what build reports hold.
+
+    :Returns:
+        A list of the presentations that are (or, for a dry run, would be)
+        converted, and a list of those that failed to convert.
+
+    Presentations are converted in the working directory, so included files
+    are found as for rst2beamer. Those that fail are dropped from the index,
+    so are tried again in the next build.
+    """
+    ## Preconditions & preparation:
+    overrides = settings_overrides or {}
+    settings_key = repr (sorted (overrides.items()))
+    index = BuildIndex (index_path, settings_key)
+    configs = config_files()
+    if (results is None):
+        results = {}
+    if shard:
+        keys = [index.key (x) for x in source_paths]
+        shards = assign_shards (estimate_costs (keys, index, history),
+            shard[1])
+        source_paths = [x for x, k in zip (source_paths, keys)
+            if (shards[k] == shard[0])]
+    old_times = dict ([(k, v.get ('seconds')) for k, v in
+        (history or {}).get ('results', {}).items()])
+    ## Main:
+    plan = []
+    for source_path in source_paths:
+        key = index.key (source_path)
+        output_path = output_path_for (source_path, outdir, index.root)
+        if force or index.is_outdated (source_path, output_path):
+            plan.append ((source_path, output_path))
+            status = STATUS_OUTDATED
+        else:
+            status = STATUS_CURRENT
+        results[key] = {'status': status, 'seconds': old_times.get (key)}
+    failed = []
+    if not dry_run:
+        for source_path, output_path in plan:
+            error = None
+            status = STATUS_BUILT
+            start_time = time.time()
+            try:
+                deps = build_deck (source_path, output_path, overrides)
+            except Exception as err:
+                error = err
+                status = STATUS_FAILED
+                failed.append (source_path)
+                index.forget (source_path)
+            else:
+                index.record (source_path, output_path, configs + deps)
+            results[index.key (source_path)] = {
+                'status': status,
+                'seconds': round (time.time() - start_time, 3),
+            }
+            if report:
+                report (source_path, error)
+        index.save()
+    ## Postconditions & return:
+    return [x[0] for x in plan], failed
+
+
+### MAIN ###
+
+def main (argv=None):
+    parser = OptionParser (usage='%prog [options] source [source ...]\n'
+            '       %prog --merge <file> report [report ...]',
+        description="Converts the Beamer presentations of a project that "
+            "have changed, or whose included files or images have, since "
+            "the last build.",
+        version='%prog ' + rst2beamer.__version__)
+    parser.add_option ('--outdir', metavar='<dir>',
+        help="Write the LaTeX output to this directory, laid out as the "
+            "sources are under the directory of the index. By default, each "
+            "output is written beside its source.")
+    parser.add_option ('--index', metavar='<file>', default=DEFAULT_INDEX,
+        help="The file recording what was built from what. Default is "
+            "'%default'.")
+    parser.add_option ('--setting', metavar='<name=value>', action='append',
+        default=[],
+        help="Use this rst2beamer setting for every presentation, named as "
+            "in rst2beamer.convert_string (e.g. 'cb_use_pygments=true'). "
+            "May be given more than once. When the settings change, every "
+            "presentation is converted again.")
+    parser.add_option ('--force', action='store_true', default=False,
+        help="Convert every presentation, whether outdated or not.")
+    parser.add_option ('-n', '--dry-run', action='store_true', default=False,
+        help="List the outdated presentations without converting them.")
+    parser.add_option ('--shard', metavar='<i/N>',
+        help="Only build the i-th of N shards of the presentations, for "
+            "splitting a build across machines.")
+    parser.add_option ('--costs', metavar='<file>',
+        help="The merged report of an earlier build, whose conversion times "
+            "are used to balance the shards.")
+    parser.add_option ('--report', metavar='<file>',
+        help="Write a report of the presentations built and their "
+            "conversion times to this file.")
+    parser.add_option ('--merge', metavar='<file>',
+        help="Merge the build reports given (in place of presentations) "
+            "into this file, checking that every presentation was built "
+            "exactly once.")
+    options, args = parser.parse_args (argv)
+    if not args:
+        parser.error ('no presentations or reports given')
+
+    if options.merge:
+        merged, problems = merge_reports ([read_report (x) for x in args])
+        write_report (options.merge, merged['decks'], merged['results'])
+        for problem in problems:
+            sys.stderr.write ('%s\n' % problem)
+        if problems:
+            sys.exit (1)
+        return
+
+    overrides = {}
+    if options.setting:
+        opt_parser = settings_parser()
+        for spec in options.setting:
+            try:
+                name, value = parse_setting (spec, opt_parser)
+            except ValueError as err:
+                parser.error (str (err))
+            overrides[name] = value
+    shard = None
+    if options.shard:
+        try:
+            shard = parse_shard (options.shard)
+        except ValueError as err:
+            parser.error (str (err))
+    history = None
+    if options.costs and os.path.exists (options.costs):
+        history = read_report (options.costs)
+
+    def report (source_path, error):
+        if (error is None):
+            sys.stdout.write ('%s\n' % source_path)
+        else:
+            sys.stderr.write ('%s: %s\n' % (source_path, error))
+
+    results = {}
+    built, failed = build_project (args, outdir=options.outdir,
+        index_path=options.index, settings_overrides=overrides,
+        force=options.force,
+        dry_run=options.dry_run, report=report, shard=shard,
+        history=history, results=results)
+    if options.report:
+        root = os.path.dirname (os.path.abspath (options.index))
+        write_report (options.report, [index_name (x, root) for x in args],
+            results, shard)
+    if options.dry_run:
+        for source_path in built:
+            sys.stdout.write ('%s\n' % source_path)
+    if failed:
+        sys.exit (1)
+
+
+if __name__ == '__main__':
+    main()
+
+
+### END ###
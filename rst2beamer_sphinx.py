@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+A Sphinx extension for building Beamer presentations.
+
+Adds a ``beamer`` builder, which translates each document of a project to a
+Beamer-flavoured LaTeX file, and makes the rst2beamer directives (columns,
+notes and so on) available to all documents. To use it, add to ``conf.py``::
+
+        extensions = ['rst2beamer_sphinx']
+        beamer_settings = {'theme': 'Madrid', 'cb_use_pygments': True}
+
+and build with ``sphinx-build -b beamer``. ``beamer_settings`` holds any
+rst2beamer settings, named as the destinations of its commandline options.
+
+The builder is safe for parallel reading and writing (``-j``) and, as Sphinx
+pickles the environment between builds, only documents that have changed (or
+whose included files have) are translated again.
+
+"""
+
+__docformat__ = 'restructuredtext en'
+
+
+### IMPORTS ###
+
+import os
+
+from docutils import nodes
+from docutils.frontend import OptionParser
+from docutils.io import StringOutput
+from docutils.transforms.frontmatter import DocTitle, DocInfo
+from docutils.utils import DependencyList
+
+from sphinx.builders import Builder
+from sphinx.util import logging
+from sphinx.util.osutil import copyfile, ensuredir, os_path
+
+import rst2beamer
+
+
+## CONSTANTS & DEFINES ###
+
+# the rst2beamer directives that Sphinx has versions of its own, which are
+# kept so as not to change the project's other builds
+SPHINX_DIRECTIVES = ['code-block', 'sourcecode', 'literalinclude', 'include']
+
+# Pygments names for Sphinx's highlight languages
+SPHINX_LANGUAGES = {
+    'default':  'python',
+    'python3':  'python',
+    'py3':      'python',
+}
+
+# the nodes of the rst2beamer directives, and whether other builders show
+# their content
+BEAMER_NODES = [
+    (rst2beamer.columnset, True),
+    (rst2beamer.column, True),
+    (rst2beamer.block, True),
+    (rst2beamer.onlybeamer, False),
+    (rst2beamer.beamer_note, False),
+    (rst2beamer.continuation_frame, False),
+]
+
+OTHER_BUILDER_FORMATS = ['html', 'latex', 'text', 'man', 'texinfo']
+
+logger = logging.getLogger (__name__)
+
+
+### IMPLEMENTATION ###
+
+class SphinxBeamerTranslator (rst2beamer.BeamerTranslator):
+    """
+    Translates Sphinx doctrees to Beamer-flavoured LaTeX.
+    """
+
+    def visit_literal_block (self, node):
+        # Sphinx gives every highlighted block a language
+        lang = node.get ('language')
+        if (lang and (node.rawsource == node.astext()) and
+                ('code-block' not in node['classes'])):
+            node['language'] = SPHINX_LANGUAGES.get (lang, lang)
+            node['classes'].append ('code-block')
+        rst2beamer.BeamerTranslator.visit_literal_block (self, node)
+
+    def visit_compound (self, node):
+        # a table of contents is for navigating the project, not a slide
+        if ('toctree-wrapper' in node['classes']):
+            raise nodes.SkipNode
+        rst2beamer.BeamerTranslator.visit_compound (self, node)
+
+    def unknown_visit (self, node):
+        # Sphinx's own nodes are set as their content, or not at all if
+        # they're invisible (e.g. index entries)
+        if isinstance (node, nodes.Invisible):
+            raise nodes.SkipNode
+
+    def unknown_departure (self, node):
+        pass
+
+
+class BeamerBuilder (Builder):
+    """
+    Builds a Beamer presentation from each document.
+    """
+    name = 'beamer'
+    format = 'latex'
+    epilog = 'The Beamer LaTeX files are in %(outdir)s.'
+    out_suffix = '.tex'
+    allow_parallel = True
+    supported_image_types = ['application/pdf', 'image/png', 'image/jpeg']
+    default_translator_class = SphinxBeamerTranslator
+
+    def get_outdated_docs (self):
+        for docname in self.env.found_docs:
+            if docname not in self.env.all_docs:
+                yield docname
+                continue
+            targetname = os.path.join (self.outdir,
+                os_path (docname) + self.out_suffix)
+            try:
+                targetmtime = os.path.getmtime (targetname)
+            except Exception:
+                targetmtime = 0
+            try:
+                srcmtime = os.path.getmtime (self.env.doc2path (docname))
+                if srcmtime > targetmtime:
+                    yield docname
+            except EnvironmentError:
+                # source doesn't exist anymore
+                pass
+
+    def get_target_uri (self, docname, typ=None):
+        return ''
+
+    def prepare_writing (self, docnames):
+        self.docwriter = rst2beamer.BeamerWriter()
+        self.docwriter.translator_class = self.get_translator_class()
+        defaults = dict (self.env.settings)
+        # Sphinx leaves the title in the document (see `write_doc`)
+        defaults['doctitle_xform'] = True
+        defaults['output_encoding'] = 'utf-8'
+        defaults.update (self.config.beamer_settings)
+        self.docsettings = OptionParser (defaults=defaults,
+            components=(self.docwriter,),
+            read_config_files=True).get_default_values()
+
+    def write_doc_serialized (self, docname, doctree):
+        # in the main process, so images are known to `finish`
+        self.post_process_images (doctree)
+
+    def write_doc (self, docname, doctree):
+        ## Preconditions & preparation:
+        settings = self.docsettings.copy()
+        settings.record_dependencies = DependencyList()
+        doctree.settings = settings
+        # promote the title and docinfo of each document, as rst2beamer does
+        DocTitle (doctree).apply()
+        DocInfo (doctree).apply()
+        for node in doctree.traverse (nodes.image):
+            node['uri'] = self.images.get (node['uri'], node['uri'])
+        ## Main:
+        destination = StringOutput (encoding=settings.output_encoding)
+        self.docwriter.write (doctree, destination)
+        outfilename = os.path.join (self.outdir,
+            os_path (docname) + self.out_suffix)
+        ensuredir (os.path.dirname (outfilename))
+        try:
+            outfile = open (outfilename, 'wb')
+            try:
+                outfile.write (destination.destination)
+            finally:
+                outfile.close()
+        except (IOError, OSError) as err:
+            logger.warning ("error writing file %s: %s", outfilename, err)
+
+    def finish (self):
+        for src, dest in self.images.items():
+            destpath = os.path.join (self.outdir, dest)
+            ensuredir (os.path.dirname (destpath))
+            copyfile (os.path.join (self.srcdir, src), destpath)
+
+
+def visit_beamer_node (self, node):
+    pass
+
+
+def depart_beamer_node (self, node):
+    pass
+
+
+def skip_beamer_node (self, node):
+    raise nodes.SkipNode
+
+
+def setup (app):
+    """
+    Register the builder, directives and nodes with Sphinx.
+    """
+    app.add_builder (BeamerBuilder)
+    app.add_config_value ('beamer_settings', {}, 'env')
+    for name, directive_cls in sorted (rst2beamer.BEAMER_DIRECTIVES.items()):
+        if name not in SPHINX_DIRECTIVES:
+            app.add_directive (name, directive_cls)
+    # other builders typeset the content of layout nodes, and drop the rest
+    for node_cls, show in BEAMER_NODES:
+        if show:
+            handlers = (visit_beamer_node, depart_beamer_node)
+        else:
+            handlers = (skip_beamer_node, None)
+        app.add_node (node_cls,
+            **dict ([(x, handlers) for x in OTHER_BUILDER_FORMATS]))
+    return {
+        'version': rst2beamer.__version__,
+        'parallel_read_safe': True,
+        'parallel_write_safe': True,
+    }
+
+
+### END ###
@@ -3,6 +3,12 @@ import sys, os
 
 from rst2beamer import __version__
 
+# the asyncio interface needs a modern Python
+modules = ['rst2beamer', 'rst2beamer_sphinx', 'rst2beamer_html',
+	'rst2beamer_project']
+if (3, 6) <= sys.version_info:
+	modules.append ('rst2beamer_aio')
+
 setup(
 	name='rst2beamer',
 	version=__version__,
@@ -23,7 +29,7 @@ setup(
 	url='http://www.agapow.net/software/rst2beamer',
 	license='GPL',
 	#packages=find_packages(exclude=['ez_setup', 'examples', 'tests']),
-	py_modules=['rst2beamer'],
+	py_modules=modules,
 	#include_package_data=True,
 	zip_safe=False,
 	install_requires=[
@@ -32,6 +38,8 @@ setup(
 	entry_points={
 		'console_scripts': [
 			'rst2beamer = rst2beamer:main',
+			'rst2beamer-html = rst2beamer_html:main',
+			'rst2beamer-project = rst2beamer_project:main',
 		],
 	},
 )
@@ -0,0 +1,87 @@
+"""Check the asyncio interface of rst2beamer_aio, by awaiting conversions
+and comparing them with the same conversions done directly.
+
+Needs Python 3.7 or later. Run it from this directory, like run_tests.py,
+or with a test runner such as pytest.
+"""
+
+import asyncio, os, sys, time, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.path.pardir))
+
+import rst2beamer
+import rst2beamer_aio
+
+
+here = os.path.dirname(os.path.abspath(__file__))
+overrides = {'report_level': 5}
+sources = [os.path.join(here, name) for name in
+           ('simple_slide_test.rst', 'overlay_test.rst', 'sectioning_test.rst')]
+
+
+def run(coroutine):
+    """Run a coroutine to completion in a new event loop."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class ConvertTest(unittest.TestCase):
+
+    def test_convert_string(self):
+        source = open(sources[0]).read()
+        tex = run(rst2beamer_aio.convert(source, sources[0], overrides))
+        self.assertEqual(tex, rst2beamer.convert_string(source, sources[0],
+                                                        overrides))
+        self.assertIn(b'\\begin{frame}', tex)
+
+    def test_convert_file(self):
+        tex = run(rst2beamer_aio.convert(source_path=sources[1],
+                                         settings_overrides=overrides))
+        self.assertEqual(tex, rst2beamer.convert_file(sources[1], overrides))
+
+    def test_convert_many(self):
+        async def collect():
+            results = {}
+            async with rst2beamer_aio.Converter(concurrency=2) as conv:
+                async for path, tex in conv.convert_many(sources, overrides):
+                    results[path] = tex
+            return results
+        results = run(collect())
+        self.assertEqual(sorted(results), sorted(sources))
+        for path in sources:
+            self.assertEqual(results[path],
+                             rst2beamer.convert_file(path, overrides))
+
+    def test_convert_many_exceptions(self):
+        async def collect():
+            async with rst2beamer_aio.Converter(use_threads=True) as conv:
+                return [x async for x in conv.convert_many(
+                    ['no-such-file.rst'], overrides, return_exceptions=True)]
+        [(path, err)] = run(collect())
+        self.assertEqual(path, 'no-such-file.rst')
+        self.assertIsInstance(err, Exception)
+
+    def test_close_without_blocking(self):
+        async def tick(ticks):
+            while True:
+                await asyncio.sleep(0.01)
+                ticks.append(None)
+
+        async def leave():
+            ticks = []
+            ticker = asyncio.ensure_future(tick(ticks))
+            async with rst2beamer_aio.Converter(use_threads=True) as conv:
+                # a conversion still running when the block is left
+                conv._get_executor().submit(time.sleep, 0.5)
+            ticker.cancel()
+            return ticks
+        # the loop kept running while the workers were waited for
+        self.assertGreater(len(run(leave())), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+"""Check that --check leaves the output alone, whether or not it finds
+problems, while still exiting with an error for a badly structured
+presentation.
+
+Run it from this directory, like run_tests.py, or with a test runner such
+as pytest.
+"""
+
+import os, shutil, subprocess, sys, tempfile, unittest
+
+here = os.path.dirname(os.path.abspath(__file__))
+script = os.path.join(here, os.path.pardir, 'rst2beamer.py')
+
+good_source = """\
+Slide
+-----
+
+.. r2b-columnset::
+
+    .. r2b-column::
+
+        Left
+
+    .. r2b-column::
+
+        Right
+"""
+
+bad_source = """\
+Slide
+-----
+
+.. r2b-column::
+
+    Not in a column set
+"""
+
+
+class CheckTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.tex_path = os.path.join(self.tmpdir, 'out.tex')
+        with open(self.tex_path, 'w') as outfile:
+            outfile.write('% existing output\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def run_check(self, source):
+        rst_path = os.path.join(self.tmpdir, 'in.rst')
+        with open(rst_path, 'w') as infile:
+            infile.write(source)
+        with open(os.devnull, 'w') as devnull:
+            return subprocess.call([sys.executable, script, '--check',
+                                    rst_path, self.tex_path],
+                                   stdout=devnull, stderr=devnull)
+
+    def assert_output_kept(self):
+        with open(self.tex_path) as outfile:
+            self.assertEqual(outfile.read(), '% existing output\n')
+
+    def test_good_structure(self):
+        self.assertEqual(self.run_check(good_source), 0)
+        self.assert_output_kept()
+
+    def test_bad_structure(self):
+        self.assertNotEqual(self.run_check(bad_source), 0)
+        self.assert_output_kept()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,14 @@
+import os
+
+# -- begin --
+def helper (x):
+    return x * 2
+# -- end --
+
+class Thing (object):
+
+    def method (self):
+        return 1
+
+    def other (self):
+        return 2
@@ -0,0 +1,252 @@
+"""Check rst2beamer-project: what the build index finds outdated, the
+forwarding of settings, and the sharding of builds (the assignment of
+presentations to shards, the parsing of shards and the merging of the
+shards' reports).
+
+Run it from this directory, like run_tests.py, or with a test runner such
+as pytest.
+"""
+
+import os, shutil, sys, tempfile, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.path.pardir))
+
+import rst2beamer_project
+from rst2beamer_project import (assign_shards, build_project, BuildIndex,
+                                merge_reports, parse_setting, parse_shard,
+                                settings_parser, STATUS_BUILT, STATUS_CURRENT,
+                                STATUS_FAILED)
+
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+talk_source = """\
+Slide
+-----
+
+.. include:: part.rst
+
+.. image:: plot.png
+"""
+
+
+costs = {'a.rst': 8.0, 'b.rst': 7.0, 'c.rst': 6.0, 'd.rst': 5.0,
+         'e.rst': 4.0, 'f.rst': 2.0, 'g.rst': 2.0, 'h.rst': 1.0}
+
+
+def make_report(shard, results, decks=sorted(costs)):
+    """Make a report as read from a shard's build."""
+    return {'format': rst2beamer_project.INDEX_FORMAT, 'shard': shard,
+            'decks': list(decks),
+            'results': dict((k, {'status': v, 'seconds': 1.0})
+                            for k, v in results.items())}
+
+
+def write_file(fpath, data):
+    with open(fpath, 'wb') as outfile:
+        outfile.write(data)
+
+
+class BuildIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.old_dir = os.getcwd()
+        self.tmpdir = tempfile.mkdtemp()
+        os.chdir(self.tmpdir)
+        write_file('talk.rst', talk_source.encode('ascii'))
+        write_file('part.rst', b'Some *included* text.\n')
+        shutil.copy(os.path.join(here, 'plot.png'), 'plot.png')
+        self.index_path = os.path.join(self.tmpdir, 'index.json')
+        self.overrides = {'report_level': 5}
+        built, failed = build_project(['talk.rst'], outdir='build',
+                                      index_path=self.index_path,
+                                      settings_overrides=self.overrides)
+        self.assertEqual((built, failed), (['talk.rst'], []))
+
+    def tearDown(self):
+        os.chdir(self.old_dir)
+        shutil.rmtree(self.tmpdir)
+
+    def is_outdated(self, overrides=None):
+        if overrides is None:
+            overrides = self.overrides
+        index = BuildIndex(self.index_path,
+                           repr(sorted(overrides.items())))
+        return index.is_outdated('talk.rst', os.path.join('build',
+                                                          'talk.tex'))
+
+    def test_unchanged(self):
+        self.assertFalse(self.is_outdated())
+        # touched, but with the same content
+        os.utime('part.rst', None)
+        os.utime('plot.png', None)
+        self.assertFalse(self.is_outdated())
+        built, failed = build_project(['talk.rst'], outdir='build',
+                                      index_path=self.index_path,
+                                      settings_overrides=self.overrides)
+        self.assertEqual(built, [])
+
+    def test_included_file_changed(self):
+        write_file('part.rst', b'Some *other* included text.\n')
+        self.assertTrue(self.is_outdated())
+
+    def test_image_changed(self):
+        with open('plot.png', 'ab') as outfile:
+            outfile.write(b'\0')
+        self.assertTrue(self.is_outdated())
+
+    def test_output_missing(self):
+        os.remove(os.path.join('build', 'talk.tex'))
+        self.assertTrue(self.is_outdated())
+
+    def test_settings_changed(self):
+        overrides = dict(self.overrides, theme='Madrid')
+        self.assertTrue(self.is_outdated(overrides))
+
+    def test_input_paths(self):
+        overrides = dict(self.overrides, preamble_file='preamble.tex')
+        build_project(['talk.rst'], outdir='build', index_path=self.index_path,
+                      settings_overrides=overrides)
+        with open(os.path.join('build', 'talk.tex'), 'rb') as infile:
+            output = infile.read()
+        # inputs are relative to the output, where LaTeX is run
+        self.assertTrue(b'\\input{../preamble.tex}' in output)
+        self.assertFalse(b'\\input{preamble.tex}' in output)
+
+    def test_commandline_settings(self):
+        stdout = sys.stdout
+        sys.stdout = open(os.devnull, 'w')
+        try:
+            rst2beamer_project.main(['--index', self.index_path,
+                                     '--outdir', 'build',
+                                     '--setting', 'report_level=5',
+                                     '--setting', 'theme=Madrid',
+                                     'talk.rst'])
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+        with open(os.path.join('build', 'talk.tex'), 'rb') as infile:
+            self.assertTrue(b'\\usetheme{Madrid}' in infile.read())
+        self.assertTrue(self.is_outdated())
+        self.assertFalse(self.is_outdated(dict(self.overrides,
+                                               theme='Madrid')))
+
+
+class ParseSettingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = settings_parser()
+
+    def test_values(self):
+        self.assertEqual(parse_setting('theme=Madrid', self.parser),
+                         ('theme', 'Madrid'))
+        self.assertEqual(parse_setting('cb-use-pygments=yes', self.parser),
+                         ('cb_use_pygments', True))
+        self.assertEqual(parse_setting('cb_timeout=2.5', self.parser),
+                         ('cb_timeout', 2.5))
+
+    def test_invalid(self):
+        for spec in ('theme', 'no_such_setting=1', 'cb_use_pygments=maybe',
+                     'shownotes=sometimes'):
+            self.assertRaises(ValueError, parse_setting, spec, self.parser)
+
+
+class AssignShardsTest(unittest.TestCase):
+
+    def test_deterministic(self):
+        shards = assign_shards(costs, 3)
+        # the same costs, given in another order
+        reordered = dict(sorted(costs.items(), reverse=True))
+        self.assertEqual(assign_shards(reordered, 3), shards)
+        self.assertEqual(assign_shards(dict(costs), 3), shards)
+
+    def test_balanced(self):
+        for total in (1, 2, 3, 4):
+            shards = assign_shards(costs, total)
+            self.assertEqual(sorted(shards), sorted(costs))
+            loads = [sum(costs[k] for k in shards if shards[k] == num)
+                     for num in range(1, total + 1)]
+            # the greedy assignment never lets shards differ by more than
+            # the costliest presentation
+            self.assertTrue(max(loads) - min(loads) <= max(costs.values()))
+        shards = assign_shards(costs, 2)
+        self.assertEqual(sorted(sum(costs[k] for k in shards
+                                    if shards[k] == num) for num in (1, 2)),
+                         [17.0, 18.0])
+
+    def test_more_shards_than_decks(self):
+        shards = assign_shards({'a.rst': 1.0, 'b.rst': 1.0}, 4)
+        self.assertEqual(shards, {'a.rst': 1, 'b.rst': 2})
+
+
+class ParseShardTest(unittest.TestCase):
+
+    def test_valid(self):
+        self.assertEqual(parse_shard('1/2'), (1, 2))
+        self.assertEqual(parse_shard(' 2 / 2 '), (2, 2))
+
+    def test_out_of_range(self):
+        for spec in ('0/2', '3/2', '1/0'):
+            self.assertRaises(ValueError, parse_shard, spec)
+
+    def test_malformed(self):
+        for spec in ('1', '1/2/3', 'a/b', '-1/2'):
+            self.assertRaises(ValueError, parse_shard, spec)
+
+    def test_commandline(self):
+        stderr = sys.stderr
+        sys.stderr = open(os.devnull, 'w')
+        try:
+            for spec in ('0/2', '3/2'):
+                self.assertRaises(SystemExit, rst2beamer_project.main,
+                                  ['--shard', spec, 'a.rst'])
+        finally:
+            sys.stderr.close()
+            sys.stderr = stderr
+
+
+class MergeReportsTest(unittest.TestCase):
+
+    def setUp(self):
+        shards = assign_shards(costs, 2)
+        self.reports = [
+            make_report([num, 2], dict((k, STATUS_BUILT) for k in shards
+                                       if shards[k] == num))
+            for num in (1, 2)]
+
+    def test_complete(self):
+        merged, problems = merge_reports(self.reports)
+        self.assertEqual(problems, [])
+        self.assertEqual(sorted(merged['results']), sorted(costs))
+        self.assertEqual(merged['shard'], None)
+
+    def test_missing_shard(self):
+        merged, problems = merge_reports(self.reports[:1])
+        self.assertTrue('Shard 2 of 2 has 0 reports.' in problems)
+        missing = [k for k in costs if k not in merged['results']]
+        self.assertTrue(missing)
+        for key in missing:
+            self.assertTrue('%s was built by 0 shards, not 1.' % key
+                            in problems)
+
+    def test_duplicate_shard(self):
+        merged, problems = merge_reports(self.reports + self.reports[:1])
+        self.assertTrue('Shard 1 of 2 has 2 reports.' in problems)
+
+    def test_built_twice(self):
+        self.reports[1]['results']['a.rst'] = {'status': STATUS_CURRENT,
+                                               'seconds': None}
+        merged, problems = merge_reports(self.reports)
+        self.assertEqual(problems, ['a.rst was built by 2 shards, not 1.'])
+
+    def test_failed(self):
+        for report in self.reports:
+            if 'b.rst' in report['results']:
+                report['results']['b.rst']['status'] = STATUS_FAILED
+        merged, problems = merge_reports(self.reports)
+        self.assertEqual(problems, ['b.rst failed to build.'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -27,9 +27,9 @@ to ask git not to track changes to these files.
 #
 #################################
 
-import txt_mixin, os
+import txt_mixin, os, sys
 
-cmd_pat = 'rst2beamer.py %s %s'
+cmd_pat = 'rst2beamer.py %s %s %s'
 
 
 def compare_two_bodies(actual_body, expected_body):
@@ -90,9 +90,11 @@ def test_one_file(actual_tex_name, expected_tex_name, \
 class tester(object):
     """A class to try and make it easy to run different rst2beamer
     tests.  For now, the primary question is how to handle cases that
-    want to also test the header and cases that want to cut it off."""
-    def __init__(self, basename, cut_header=True):
+    want to also test the header and cases that want to cut it off.
+    Any command line options for rst2beamer can be passed as cmd_opts."""
+    def __init__(self, basename, cut_header=True, cmd_opts=''):
         self.basename = basename
+        self.cmd_opts = cmd_opts
         self.rst_name = basename + '.rst'
         self.expected_out_name = basename + '_expected.tex'
         self.tex_name = basename + '.tex'
@@ -104,7 +106,7 @@ class tester(object):
             os.remove(self.tex_name)#if the tex file is left laying around and
                                     #rst2beamer fails to translate, the test
                                     #could falsely pass
-        cmd = cmd_pat % (self.rst_name, self.tex_name)
+        cmd = cmd_pat % (self.cmd_opts, self.rst_name, self.tex_name)
         if options.traceback:
             cmd += ' --traceback'
 
@@ -139,6 +141,8 @@ if __name__ == '__main__':
                      'overlay_test',\
                      'sectioning_test', \
                      'figure_centering_test', \
+                     'literalinclude_test', \
+                     'table_test', \
                      ]
 
 
@@ -150,10 +154,15 @@ if __name__ == '__main__':
     keep_header_tests = [tester(basename, cut_header=False) for basename \
                          in keep_header_list]
 
+    option_tests = [tester('light_formatter_test', cmd_opts= \
+                           '--codeblocks-use-pygments '
+                           '--codeblocks-formatter light'), \
+                    ]
+
     failures = 0
     passed = 0
 
-    all_tests = cut_header_tests + keep_header_tests
+    all_tests = cut_header_tests + keep_header_tests + option_tests
 
     for test in all_tests:
         cur_fail = test.run_test()
@@ -168,10 +177,20 @@ if __name__ == '__main__':
             os.system(pdfcmd)
 
 
+    #conversions in threads must match those run one after another
+    stress_cmd = '%s thread_stress_test.py' % sys.executable
+    print(stress_cmd)
+    if os.system(stress_cmd) == 0:
+        passed += 1
+    else:
+        failures += 1
+
 
     print('='*30)
     print('tests passed = %i' % passed)
     print('total failures = %i' % failures)
 
+    sys.exit(int(bool(failures)))
+
 
 
@@ -0,0 +1,79 @@
+"""Check the beamer builder of rst2beamer_sphinx, by building a small project
+twice in the same output directory and looking at what it finds outdated.
+
+Needs Sphinx, and is skipped without it. Run it from this directory, like
+run_tests.py, or with a test runner such as pytest.
+"""
+
+import os, shutil, sys, tempfile, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.path.pardir))
+
+try:
+    from sphinx.application import Sphinx
+except ImportError:
+    Sphinx = None
+
+
+conf_source = """\
+extensions = ['rst2beamer_sphinx']
+beamer_settings = {'report_level': 5}
+"""
+
+doc_source = """\
+%s
+=====
+
+Slide
+-----
+
+Some text.
+"""
+
+
+def write_file(fpath, data):
+    with open(fpath, 'w') as outfile:
+        outfile.write(data)
+
+
+@unittest.skipIf(Sphinx is None, 'Sphinx is not installed')
+class BeamerBuilderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.srcdir = os.path.join(self.tmpdir, 'src')
+        self.outdir = os.path.join(self.tmpdir, 'build')
+        os.mkdir(self.srcdir)
+        write_file(os.path.join(self.srcdir, 'conf.py'), conf_source)
+        write_file(os.path.join(self.srcdir, 'index.rst'),
+                   doc_source % 'Index')
+        write_file(os.path.join(self.srcdir, 'talk.rst'), doc_source % 'Talk')
+        self.devnull = open(os.devnull, 'w')
+
+    def tearDown(self):
+        self.devnull.close()
+        shutil.rmtree(self.tmpdir)
+
+    def make_app(self):
+        return Sphinx(self.srcdir, self.srcdir, self.outdir,
+                      os.path.join(self.outdir, '.doctrees'), 'beamer',
+                      status=None, warning=self.devnull)
+
+    def test_rebuild(self):
+        self.make_app().build()
+        self.assertTrue(os.path.exists(os.path.join(self.outdir, 'talk.tex')))
+        # a later build in the same directory finds nothing to translate
+        app = self.make_app()
+        self.assertEqual(sorted(app.builder.get_outdated_docs()), [])
+        app.build()
+        # until a source changes
+        talk_path = os.path.join(self.srcdir, 'talk.rst')
+        later = os.path.getmtime(talk_path) + 10
+        os.utime(talk_path, (later, later))
+        app = self.make_app()
+        self.assertEqual(sorted(app.builder.get_outdated_docs()), ['talk'])
+
+
+if __name__ == '__main__':
+    unittest.main()
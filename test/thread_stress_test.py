@@ -0,0 +1,133 @@
+"""Check that conversions running at the same time in threads of one
+process give the same output as when run one after another.
+
+Every .rst file here and in docs/examples is converted with each of a
+number of settings, first serially and then all together by a pool of
+threads, with the jobs in a shuffled order and repeated several times.
+Some plain docutils LaTeX conversions are mixed in, to check that the
+Beamer directives and defaults don't leak into other writers.
+
+Run it from this directory, like run_tests.py (which also runs it), or with
+a test runner such as pytest. As a script, it exits with an error if any
+conversion differs.
+"""
+
+import glob, os, random, sys, threading, unittest
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+sys.path.insert(0, os.path.join(here, os.path.pardir))
+
+import rst2beamer
+from docutils.core import publish_string
+
+
+settings_list = [{},
+                 {'cb_use_pygments': True},
+                 {'cb_use_pygments': True, 'cb_formatter': 'light'},
+                 {'cb_use_pygments': True, 'dedupe': True},
+                 {'shownotes': 'true', 'theme': 'Madrid'},
+                 ]
+
+
+def convert(job):
+    """Convert one source file, returning the output or the error."""
+    writer_name, fpath, settings = job
+    overrides = {'report_level': 5, 'halt_level': 5}
+    overrides.update(settings)
+    source = open(fpath, 'rb').read()
+    try:
+        if writer_name == 'beamer':
+            return rst2beamer.convert_string(source, fpath, overrides)
+        return publish_string(source=source, source_path=fpath,
+                              writer_name=writer_name,
+                              settings_overrides=overrides)
+    except Exception as err:
+        return 'error: %r' % (err,)
+
+
+def convert_in_threads(jobs, num_threads):
+    """Convert all the jobs with a pool of threads."""
+    todo = queue.Queue()
+    for i, job in enumerate(jobs):
+        todo.put((i, job))
+    results = [None] * len(jobs)
+
+    def worker():
+        while True:
+            try:
+                i, job = todo.get_nowait()
+            except queue.Empty:
+                return
+            results[i] = convert(job)
+
+    threads = [threading.Thread(target=worker) for i in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def make_jobs():
+    """List the jobs: each source file with each of the settings."""
+    rst_files = sorted(glob.glob(os.path.join(here, '*.rst')) +
+                       glob.glob(os.path.join(here, os.path.pardir, 'docs',
+                                              'examples', '*.rst')))
+    jobs = [('beamer', fpath, settings) for fpath in rst_files
+            for settings in settings_list]
+    jobs += [('latex', fpath, {}) for fpath in rst_files]
+    return jobs
+
+
+def find_failures(num_threads, repeats):
+    """Convert every job serially and then in threads, and return the jobs
+    whose results differ, once for each differing conversion."""
+    jobs = make_jobs()
+    expected = dict((i, convert(job)) for i, job in enumerate(jobs))
+
+    order = list(range(len(jobs))) * repeats
+    random.shuffle(order)
+    actual = convert_in_threads([jobs[i] for i in order], num_threads)
+
+    return [jobs[i] for i, result in zip(order, actual)
+            if result != expected[i]]
+
+
+class ThreadStressTest(unittest.TestCase):
+
+    def test_threads_match_serial(self):
+        failures = find_failures(num_threads=8, repeats=1)
+        self.assertEqual(['%s %s %r' % job for job in failures], [])
+
+
+if __name__ == '__main__':
+    from optparse import OptionParser
+
+    usage = 'usage: %prog [options]'
+    parser = OptionParser(usage)
+
+    parser.add_option("-n","--threads", type="int", dest="threads", \
+                      help="the number of threads to convert with.")
+
+    parser.add_option("-r","--repeats", type="int", dest="repeats", \
+                      help="the number of times to convert each job.")
+
+    parser.set_defaults(threads=8, repeats=3)
+
+    (options, args) = parser.parse_args()
+
+    failures = find_failures(options.threads, options.repeats)
+    for writer_name, fpath, settings in failures:
+        print('failure: %s %s %r' % (writer_name, fpath, settings))
+
+    print('='*30)
+    print('conversions = %i' % (len(make_jobs()) * options.repeats))
+    print('total failures = %i' % len(failures))
+
+    sys.exit(int(bool(failures)))